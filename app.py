@@ -1,131 +1,97 @@
-import streamlit as st
-import spacy
-import json
-import re
-import matplotlib.pyplot as plt
+import time
+_import_start = time.perf_counter()
+
+import itertools
 import os
 
+import streamlit as st
+
+import drone_parser
+from fleet_state import FleetState
+from parse_cache import ParseCache, model_version
+from pipeline_timing import PipelineTimer
+from rule_parser import RuleParser
+from telemetry_log import TelemetryLog, TelemetryReader
+
+# Modules stay imported between reruns, so this keeps the first (cold) value
+drone_parser.startup_timings.setdefault("app_imports_s", time.perf_counter() - _import_start)
+
 # --- 1. Smart Model Loader ---
 @st.cache_resource
 def load_model():
-    # Get the absolute path of the directory this script is in
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # Path 1: The expected path from our project
-    model_path_standard = os.path.join(script_dir, "model_output_1000", "model-best")
-    
-    # Path 2: Just the model-best folder in the root
-    model_path_flat = os.path.join(script_dir, "model-best")
-    
-    # Path 3: The root directory itself
-    model_path_root = script_dir
-
-    if os.path.exists(model_path_standard):
-        return spacy.load(model_path_standard)
-    elif os.path.exists(model_path_flat):
-        return spacy.load(model_path_flat)
-    elif os.path.exists(os.path.join(model_path_root, "config.cfg")):
-        return spacy.load(model_path_root)
-    else:
+    nlp = drone_parser.load_model()
+    if nlp is None:
         st.error("ERROR: Could not find model files.")
-        return None
+    return nlp
 
 nlp = load_model()
 
-# --- 2. Command Generator Logic ---
-def clean_value(value_str):
-    if not value_str:
-        return None
-    match = re.search(r"(\d+(\.\d+)?)", str(value_str))
-    if match:
-        return float(match.group(1))
-    return None
-
-def generate_command(parsed_json):
-    intent = None
-    slots = parsed_json["slots"]
-    
-    if parsed_json["intents"]:
-        intent = parsed_json["intents"][0]
-    else:
-        # Fallback: If no intent, but we have slots, guess 'fly'
-        if "distance" in slots and "direction" in slots:
-            intent = "fly"
-            st.info("No intent found, but slots detected. Assuming 'fly'.")
+@st.cache_resource
+def load_rules():
+    # Handles formulaic commands ("land", "fly 50m north") without the model
+    return RuleParser()
+
+rules = load_rules()
+
+@st.cache_resource
+def load_cache():
+    # Streamlit reruns the whole script on every widget change, so repeated
+    # commands are answered from here. Set DRONETALK_CACHE_DB to keep the
+    # results on disk between restarts.
+    version = model_version(drone_parser.find_model_path())
+    return ParseCache(version, db_path=os.environ.get("DRONETALK_CACHE_DB"))
+
+cache = load_cache()
+
+@st.cache_resource
+def load_timer():
+    return PipelineTimer()
+
+@st.cache_resource
+def load_telemetry():
+    # Set DRONETALK_TELEMETRY to a directory to log every executed command
+    # (replay it with telemetry_log.py)
+    directory = os.environ.get("DRONETALK_TELEMETRY")
+    return TelemetryLog(directory) if directory else None
+
+telemetry = load_telemetry()
+
+@st.cache_resource
+def load_drone_ids():
+    # Shared by every browser session, so each one logs as its own drone.
+    # Carry on after the drones already in the log from earlier runs.
+    first = 0
+    directory = os.environ.get("DRONETALK_TELEMETRY")
+    if directory:
+        with TelemetryReader(directory) as log:
+            first = max((int(s.valid()["drone"].max()) + 1 for s in log.segments if s.count), default=0)
+    return itertools.count(first)
 
-    if not intent:
-        return {"command": "REJECT", "reason": "No intent recognized."}
-
-    final_command = {}
-
-    if intent == "fly":
-        dist = clean_value(slots.get("distance"))
-        direction = slots.get("direction")
-        if not dist or not direction:
-            return {"command": "REJECT", "reason": "Fly command needs distance AND direction."}
-        final_command = {
-            "command": "MOVE", 
-            "direction": direction, 
-            "distance_meters": dist
-        }
-    
-    elif intent == "hover":
-        dur = clean_value(slots.get("duration"))
-        if not dur:
-            return {"command": "REJECT", "reason": "Hover command needs duration."}
-        final_command = {"command": "HOVER", "duration_seconds": dur}
-
-    elif intent == "land":
-        final_command = {"command": "LAND"}
-
-    elif intent == "capture":
-        count = clean_value(slots.get("count"))
-        if not count:
-            # Bug fix: check distance slot if count is missing
-            count = clean_value(slots.get("distance")) 
-        if not count:
-            count = 1
-        final_command = {"command": "CAPTURE_IMAGE", "count": int(count)}
-    
-    elif intent == "scan":
-         final_command = {"command": "SCAN_AREA"}
-
-    elif intent == "return":
-        # Special move command to go home
-        final_command = {"command": "MOVE", "direction": "home", "distance_meters": 0}
-        
-    elif intent == "takeoff":
-        final_command = {"command": "TAKEOFF"}
-
-    else:
-        final_command = {"command": intent.upper()}
-
-    return final_command
+# --- 2. Command Generator Logic ---
+# Lives in drone_parser.py so the parsing service can share it.
 
 # --- 3. Initialize Drone State (Session Memory) ---
-if 'x_pos' not in st.session_state:
-    st.session_state.x_pos = 0
-if 'y_pos' not in st.session_state:
-    st.session_state.y_pos = 0
+# One drone for now; FleetState keeps any number of them in one array
+if 'fleet' not in st.session_state:
+    st.session_state.fleet = FleetState(1)
+    st.session_state.drone_id = next(load_drone_ids())
+    # The command last run and its result. Any widget change reruns this
+    # script, and the same text must not move or log the drone again.
+    st.session_state.last_command = None
+    st.session_state.last_result = None
 
 # --- 4. Plotting Function ---
+def get_renderer():
+    # matplotlib is slow to import, so wait until we actually draw
+    if 'renderer' not in st.session_state:
+        from map_renderer import MapRenderer
+        st.session_state.renderer = MapRenderer(len(st.session_state.fleet))
+        st.session_state.renderer.record(st.session_state.fleet.positions)
+    return st.session_state.renderer
+
 def plot_drone_position():
-    x = st.session_state.x_pos
-    y = st.session_state.y_pos
-    
-    fig, ax = plt.subplots()
-    ax.scatter([x], [y], marker='o', s=200, label='Drone', zorder=10)
-    ax.scatter([0], [0], marker='x', s=100, color='red', label='Home')
-    
-    # Set plot limits
-    ax.set_xlim(-300, 300)
-    ax.set_ylim(-300, 300)
-    ax.set_xlabel("West <---> East")
-    ax.set_ylabel("South <---> North")
-    ax.grid(True)
-    ax.legend()
-    
-    st.pyplot(fig)
+    # The renderer keeps its figure between reruns and only redraws the drones and trail
+    st.image(get_renderer().render())
 
 # --- 5. Build the Streamlit App UI ---
 st.set_page_config(page_title="DroneTalk", layout="wide")
@@ -134,60 +100,65 @@ if nlp:
     st.title("DroneTalk: Voice Pilots Interface")
     st.markdown("### Natural Language Drone Control System")
 
+    # --- Latency Panel (opt-in) ---
+    timer = None
+    with st.sidebar:
+        st.subheader("Latency")
+        if st.checkbox("Time each pipeline stage", value=False):
+            timer = load_timer()
+            latency = timer.summary()
+            if latency:
+                st.table({
+                    stage: {k: round(v, 3) for k, v in stats.items()}
+                    for stage, stats in latency.items()
+                })
+            else:
+                st.caption("No commands timed yet.")
+            with st.expander("Prometheus metrics"):
+                st.code(timer.prometheus(), language="text")
+
+        st.subheader("Startup")
+        for phase, seconds in drone_parser.startup_timings.items():
+            st.caption(f"{phase}: {seconds:.2f}s")
+
     user_command = st.text_input("Enter command:", placeholder="Try 'fly 75m north east' or 'take 5 photos'...")
 
     col1, col2, col3 = st.columns([1.2, 1, 1])
 
     with col1:
         st.subheader("Live Drone Map")
+        # Filled in once, after the command (if any) has moved the drone
         plot_container = st.empty()
-        with plot_container:
-            plot_drone_position()
 
     if user_command:
-        # --- Run Full Pipeline ---
-        doc = nlp(user_command)
-        spacy_intents = {k: v for k, v in doc.cats.items() if v > 0.5}
-        spacy_slots = {ent.label_.lower(): ent.text for ent in doc.ents}
-        
-        spacy_output_json = {
-            "command": user_command,
-            "intents": list(spacy_intents.keys()),
-            "slots": spacy_slots
-        }
-        
-        final_command_json = generate_command(spacy_output_json)
-        
-        # --- Update Movement Logic (with Diagonal Support) ---
-        if final_command_json.get("command") == "MOVE":
-            dist = final_command_json.get("distance_meters", 0)
-            direction = final_command_json.get("direction", "").lower()
-            
-            # Clean direction string for matching
-            direction = direction.replace("-", " ")
-            
-            # Check for keywords to handle diagonals
-            if "north" in direction:
-                st.session_state.y_pos += dist
-            if "south" in direction:
-                st.session_state.y_pos -= dist
-            if "east" in direction:
-                st.session_state.x_pos += dist
-            if "west" in direction:
-                st.session_state.x_pos -= dist
-            
-            if direction == "home":
-                st.session_state.x_pos = 0
-                st.session_state.y_pos = 0
-                st.success("Returned to Home Base!")
+        # --- Run Full Pipeline (only for a new command, not on every rerun) ---
+        is_new = user_command != st.session_state.last_command
+        if is_new:
+            result = drone_parser.parse_command(nlp, user_command, rules=rules, cache=cache, timer=timer)
+            st.session_state.last_command = user_command
+            st.session_state.last_result = result
+        result = st.session_state.last_result
+        spacy_output_json = result["parsed"]
+        final_command_json = result["final_command"]
+
+        if not spacy_output_json["intents"] and final_command_json.get("command") != "REJECT":
+            st.info("No intent found, but slots detected. Assuming 'fly'.")
+
+        # --- Update Movement Logic (diagonals, up/down, ft/km) ---
+        if is_new and final_command_json.get("command") == "MOVE":
+            st.session_state.fleet.apply_commands([0], [final_command_json])
+            get_renderer().record(st.session_state.fleet.positions)
 
-            # Redraw the plot
-            with plot_container:
-                plot_drone_position()
+        if is_new and telemetry is not None and final_command_json.get("command") != "REJECT":
+            telemetry.append(st.session_state.drone_id, final_command_json, st.session_state.fleet.positions[0])
+
+        if final_command_json.get("direction") == "home":
+            st.success("Returned to Home Base!")
 
         # --- Display Results ---
         with col2:
             st.subheader("AI Brain (spaCy)")
+            st.caption(f"Parsed by: {result['source']}")
             st.json(spacy_output_json)
             
         with col3:
@@ -198,5 +169,8 @@ if nlp:
             else:
                 st.success("Command Executed")
                 st.json(final_command_json)
+
+    with plot_container:
+        plot_drone_position()
 else:
     st.error("Model is not loaded. Please check the logs.")
\ No newline at end of file
@@ -0,0 +1,211 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+import spacy
+
+import data_generator_1000
+from drone_parser import doc_to_json, find_model_path, generate_command, parse_commands
+from parse_cache import model_version
+from rule_parser import RuleParser
+
+DEFAULT_BATCH_SIZES = [1, 16, 64, 256]
+DEFAULT_PROCESSES = [1, 2]
+
+
+# --- 1. Datasets ---
+def load_csv_commands(path):
+    with open(path, newline="") as f:
+        return [row["command"] for row in csv.DictReader(f)]
+
+def synthetic_commands(scale, seed):
+    """Commands built from data_generator_1000's templates (duplicates kept)."""
+    return [row[0] for row in data_generator_1000.generate_rows(1000 * scale, seed)]
+
+
+# --- 2. Measurements ---
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return sorted_values[index]
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux (bytes on macOS)
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {"self": own / scale, "children": children / scale}
+
+def run_single_process(nlp, commands, batch_size, rules, conditional_ner=False, ner_stats=None):
+    """
+    Feeds the commands in batches, like a client sending requests.
+    Every command in a batch gets that batch's latency.
+    """
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, len(commands), batch_size):
+        chunk = commands[i:i + batch_size]
+        batch_start = time.perf_counter()
+        parse_commands(nlp, chunk, batch_size=batch_size, rules=rules, conditional_ner=conditional_ner,
+                       ner_stats=ner_stats)
+        latencies.extend([time.perf_counter() - batch_start] * len(chunk))
+    return time.perf_counter() - start, latencies
+
+def run_multi_process(nlp, commands, batch_size, n_process):
+    """
+    One nlp.pipe call spread over n_process workers. Latency here is the
+    time between finished batches (the steady-state service time).
+    """
+    latencies = []
+    start = time.perf_counter()
+    last = start
+    for i, doc in enumerate(nlp.pipe(commands, batch_size=batch_size, n_process=n_process)):
+        generate_command(doc_to_json(doc))
+        if (i + 1) % batch_size == 0 or i + 1 == len(commands):
+            now = time.perf_counter()
+            in_batch = (i % batch_size) + 1
+            latencies.extend([now - last] * in_batch)
+            last = now
+    return time.perf_counter() - start, latencies
+
+def benchmark(nlp, name, commands, batch_size, n_process, fast_path, conditional_ner=False):
+    rules = RuleParser() if fast_path else None
+    ner_stats = {}
+    if n_process == 1:
+        seconds, latencies = run_single_process(nlp, commands, batch_size, rules, conditional_ner, ner_stats)
+    else:
+        seconds, latencies = run_multi_process(nlp, commands, batch_size, n_process)
+
+    latencies.sort()
+    run = {
+        "dataset": name,
+        "batch_size": batch_size,
+        "n_process": n_process,
+        "fast_path": fast_path,
+        "conditional_ner": conditional_ner,
+        "commands": len(commands),
+        "seconds": seconds,
+        "commands_per_sec": len(commands) / seconds if seconds else 0.0,
+        "latency_ms": {
+            "mean": 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+            "p50": 1000 * percentile(latencies, 0.50),
+            "p95": 1000 * percentile(latencies, 0.95),
+            "p99": 1000 * percentile(latencies, 0.99),
+        },
+        # Peak RSS only ever grows, so this is the peak up to this run
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if rules is not None:
+        run["fast_path_stats"] = rules.stats.report()
+    if conditional_ner:
+        # Share of the commands sent to the model (rule hits excluded) that
+        # skipped ner, counted during the timed run
+        docs = ner_stats.get("docs", 0)
+        run["ner_skip_rate"] = ner_stats.get("ner_skipped", 0) / docs if docs else 0.0
+    return run
+
+def run_key(run):
+    return (run["dataset"], run["batch_size"], run["n_process"], run["fast_path"], run.get("conditional_ner", False))
+
+
+# --- 3. Comparing Reports ---
+def compare_reports(old, new, max_regression):
+    """Prints throughput changes per run. Returns False if any run got too slow."""
+    old_runs = {run_key(r): r for r in old["runs"]}
+    ok = True
+    for run in new["runs"]:
+        key = run_key(run)
+        before = old_runs.get(key)
+        if before is None or not before["commands_per_sec"]:
+            continue
+        change = run["commands_per_sec"] / before["commands_per_sec"] - 1
+        flag = ""
+        if change < -max_regression:
+            flag = "  <-- REGRESSION"
+            ok = False
+        print(f"{key}: {before['commands_per_sec']:.0f} -> {run['commands_per_sec']:.0f} cmd/s ({change:+.1%}){flag}")
+    return ok
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark DroneTalk command parsing")
+    parser.add_argument("--model", default=None, help="Model folder (default: model_output_1000/model-best)")
+    parser.add_argument("--csv", default="drone_commands_1000.csv")
+    parser.add_argument("--synthetic-scales", type=int, nargs="*", default=[10],
+                        help="Extra datasets from the generator templates (1 = ~1000 commands)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--processes", type=int, nargs="+", default=DEFAULT_PROCESSES)
+    parser.add_argument("--fast-path", action="store_true", help="Also benchmark with the rule-based fast path")
+    parser.add_argument("--conditional-ner", action="store_true",
+                        help="Also benchmark skipping ner for slot-free intents")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_report.json")
+    parser.add_argument("--compare", default=None, help="Earlier report to compare throughput against")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="Allowed throughput drop (fraction) before --compare fails")
+    args = parser.parse_args()
+
+    model_path = args.model or find_model_path()
+    if model_path is None:
+        print("ERROR: Could not find model files.")
+        exit(1)
+    nlp = spacy.load(model_path)
+
+    datasets = {}
+    if os.path.exists(args.csv):
+        datasets[os.path.basename(args.csv)] = load_csv_commands(args.csv)
+    for scale in args.synthetic_scales:
+        datasets[f"synthetic_x{scale}"] = synthetic_commands(scale, args.seed)
+
+    # Warm up so the first run doesn't pay for lazy initialisation
+    list(nlp.pipe(next(iter(datasets.values()))[:100]))
+
+    runs = []
+    for name, commands in datasets.items():
+        for n_process in args.processes:
+            for batch_size in args.batch_sizes:
+                modes = [(False, False)]
+                if n_process == 1:
+                    if args.fast_path:
+                        modes.append((True, False))
+                    if args.conditional_ner:
+                        modes.append((False, True))
+                    if args.fast_path and args.conditional_ner:
+                        modes.append((True, True))
+                for fast_path, conditional_ner in modes:
+                    run = benchmark(nlp, name, commands, batch_size, n_process, fast_path, conditional_ner)
+                    runs.append(run)
+                    print(f"{name:>24} batch={batch_size:<4} procs={n_process} fast_path={fast_path!s:<5} "
+                          f"cond_ner={conditional_ner!s:<5} "
+                          f"{run['commands_per_sec']:>9.0f} cmd/s  p95={run['latency_ms']['p95']:.2f}ms")
+
+    report = {
+        "meta": {
+            "model_path": model_path,
+            "model_version": model_version(model_path),
+            "spacy_version": spacy.__version__,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "datasets": {name: len(commands) for name, commands in datasets.items()},
+        "runs": runs,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved report to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        if not compare_reports(previous, report, args.max_regression):
+            exit(1)
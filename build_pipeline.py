@@ -0,0 +1,259 @@
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import data_generator_1000 as generator
+import spacy_training_data_1000 as annotator
+import convert_data_1000 as converter
+
+STATE_FILE = ".build_state.json"
+
+
+# --- 1. Hashing ---
+def hash_json(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def generator_inputs():
+    """Everything that decides what data_generator_1000 produces."""
+    return {
+        "directions": generator.all_directions,
+        "simple_directions": generator.simple_directions,
+        "count_words": generator.count_words,
+        "fly": generator.fly_templates,
+        "capture": generator.capture_templates,
+        "hover": generator.hover_templates,
+        "other": generator.cmd_templates,
+        "task_map": generator.task_map,
+        "compound": generator.compound_templates,
+        "weights": generator.ROW_WEIGHTS,
+        "code": hash_file(generator.__file__),
+    }
+
+def annotator_inputs():
+    """The labelling rules: PATTERNS and INTENT_KEYWORDS (plus the code using them)."""
+    return {
+        "patterns": {label: [p.pattern, p.flags] for label, p in annotator.PATTERNS.items()},
+        "keywords": annotator.INTENT_KEYWORDS,
+        "code": hash_file(annotator.__file__),
+    }
+
+
+# --- 2. Stage Workers ---
+def annotate_shard(job):
+    csv_path, jsonl_path = job
+    with open(csv_path, newline="") as f:
+        commands = [row["command"] for row in csv.DictReader(f)]
+    with open(jsonl_path, "w") as f:
+        for example in annotator.annotate_batch(commands):
+            f.write(json.dumps(example) + "\n")
+    return jsonl_path
+
+def convert_shard(job):
+    index, jsonl_path, train_path, dev_path, dev_ratio, seed = job
+    examples = list(converter.read_examples(jsonl_path))
+    return converter.convert_chunk((index, examples, train_path, dev_path, dev_ratio, seed))
+
+def run_jobs(func, jobs, workers, initializer=None):
+    if not jobs:
+        return []
+    if workers <= 1 or len(jobs) <= 1:
+        if initializer:
+            initializer()
+        return [func(job) for job in jobs]
+    with multiprocessing.Pool(workers, initializer=initializer) as pool:
+        return pool.map(func, jobs)
+
+
+# --- 3. The Runner ---
+class PipelineRunner:
+    """
+    Runs generate -> annotate -> convert -> train inside workdir.
+
+    Every stage (and every shard in annotate/convert) remembers the hash
+    of its inputs in .build_state.json. A stage is skipped when that hash
+    is unchanged and its outputs still exist, so editing one regex only
+    re-annotates, re-converts and retrains; the generated data is kept.
+    """
+
+    def __init__(self, args, train_args=()):
+        self.args = args
+        self.train_args = list(train_args)
+        self.workdir = args.workdir
+        self.state_path = os.path.join(self.workdir, STATE_FILE)
+        self.state = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                self.state = json.load(f)
+        self.timings = {}
+        self.counts = {}
+
+    def path(self, *parts):
+        return os.path.join(self.workdir, *parts)
+
+    def save_state(self):
+        with open(self.state_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+
+    def needs_run(self, stage, key, input_hash, outputs):
+        done = self.state.get(stage, {}).get(key)
+        return done != input_hash or not all(os.path.exists(p) for p in outputs)
+
+    def mark_done(self, stage, key, input_hash):
+        self.state.setdefault(stage, {})[key] = input_hash
+        self.save_state()
+
+    @staticmethod
+    def remove_stale(directory, pattern, keep):
+        for path in glob.glob(os.path.join(directory, pattern)):
+            if path not in keep:
+                os.remove(path)
+
+    # --- Stage A: generate ---
+    def generate(self):
+        args = self.args
+        out_dir = self.path("generated")
+        input_hash = hash_json({
+            "inputs": generator_inputs(), "rows": args.rows, "seed": args.seed, "shard_size": args.shard_size,
+        })
+        shards = sorted(glob.glob(os.path.join(out_dir, "commands-*.csv")))
+        if shards and not self.needs_run("generate", "all", input_hash, shards):
+            self.counts["generate"] = {"skipped": True, "shards": len(shards)}
+            return shards
+
+        self.remove_stale(out_dir, "commands-*.csv", keep=set())
+        seen = generator.BloomFilter(args.rows)
+        writer = generator.ShardWriter(out_dir, "csv", args.shard_size)
+        for row in generator.generate_rows(args.rows, args.seed, workers=args.workers):
+            if not seen.add(row[0]):
+                writer.write(row)
+        writer.close()
+        self.mark_done("generate", "all", input_hash)
+        self.counts["generate"] = {"skipped": False, "rows": writer.total, "shards": len(writer.paths)}
+        return writer.paths
+
+    # --- Stage B: annotate (per shard) ---
+    def annotate(self, csv_shards):
+        out_dir = self.path("annotated")
+        os.makedirs(out_dir, exist_ok=True)
+        rules_hash = hash_json(annotator_inputs())
+
+        jobs, hashes, outputs = [], {}, []
+        for csv_path in csv_shards:
+            name = os.path.splitext(os.path.basename(csv_path))[0]
+            jsonl_path = os.path.join(out_dir, name + ".jsonl")
+            outputs.append(jsonl_path)
+            hashes[name] = hash_json([rules_hash, hash_file(csv_path)])
+            if self.needs_run("annotate", name, hashes[name], [jsonl_path]):
+                jobs.append((csv_path, jsonl_path))
+
+        run_jobs(annotate_shard, jobs, self.args.workers)
+        for csv_path, _ in jobs:
+            name = os.path.splitext(os.path.basename(csv_path))[0]
+            self.mark_done("annotate", name, hashes[name])
+        self.remove_stale(out_dir, "*.jsonl", keep=set(outputs))
+        self.counts["annotate"] = {"shards": len(outputs), "rebuilt": len(jobs)}
+        return outputs
+
+    # --- Stage C: convert (per shard) ---
+    def convert(self, jsonl_shards):
+        args = self.args
+        train_dir, dev_dir = self.path("train"), self.path("dev")
+        os.makedirs(train_dir, exist_ok=True)
+        os.makedirs(dev_dir, exist_ok=True)
+        code_hash = hash_file(converter.__file__)
+
+        jobs, hashes, outputs = [], {}, []
+        for index, jsonl_path in enumerate(jsonl_shards):
+            name = os.path.splitext(os.path.basename(jsonl_path))[0]
+            train_path = os.path.join(train_dir, name + ".spacy")
+            dev_path = os.path.join(dev_dir, name + ".spacy")
+            outputs += [train_path, dev_path]
+            hashes[name] = hash_json([code_hash, hash_file(jsonl_path), index, args.dev_ratio, args.seed])
+            if self.needs_run("convert", name, hashes[name], [train_path, dev_path]):
+                jobs.append((index, jsonl_path, train_path, dev_path, args.dev_ratio, args.seed))
+
+        run_jobs(convert_shard, jobs, args.workers, initializer=converter.init_worker)
+        for job in jobs:
+            name = os.path.splitext(os.path.basename(job[1]))[0]
+            self.mark_done("convert", name, hashes[name])
+        self.remove_stale(train_dir, "*.spacy", keep=set(outputs))
+        self.remove_stale(dev_dir, "*.spacy", keep=set(outputs))
+        self.counts["convert"] = {"shards": len(jsonl_shards), "rebuilt": len(jobs)}
+        return train_dir, dev_dir
+
+    # --- Stage D: train ---
+    def train(self, train_dir, dev_dir):
+        args = self.args
+        model_dir = self.path("model")
+        corpus = sorted(glob.glob(os.path.join(train_dir, "*.spacy")) + glob.glob(os.path.join(dev_dir, "*.spacy")))
+        input_hash = hash_json([hash_file(args.config), self.train_args] + [hash_file(p) for p in corpus])
+        best = os.path.join(model_dir, "model-best")
+        if not self.needs_run("train", "model", input_hash, [best]):
+            self.counts["train"] = {"skipped": True}
+            return best
+
+        subprocess.run(
+            [sys.executable, "-m", "spacy", "train", args.config, "--output", model_dir,
+             "--paths.train", train_dir, "--paths.dev", dev_dir] + self.train_args,
+            check=True,
+        )
+        self.mark_done("train", "model", input_hash)
+        self.counts["train"] = {"skipped": False}
+        return best
+
+    def timed(self, stage, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.timings[stage] = time.perf_counter() - start
+        print(f"[{stage}] {self.counts.get(stage, {})} in {self.timings[stage]:.2f}s")
+        return result
+
+    def run(self):
+        os.makedirs(self.workdir, exist_ok=True)
+        csv_shards = self.timed("generate", self.generate)
+        jsonl_shards = self.timed("annotate", self.annotate, csv_shards)
+        train_dir, dev_dir = self.timed("convert", self.convert, jsonl_shards)
+        if not self.args.skip_train:
+            self.timed("train", self.train, train_dir, dev_dir)
+
+        report = {"timings_s": self.timings, "stages": self.counts}
+        with open(self.path("build_report.json"), "w") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental data -> annotations -> DocBin -> model build")
+    parser.add_argument("--workdir", default="build")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--shard-size", type=int, default=10000, help="Rows per generated commands-*.csv shard")
+    parser.add_argument("--dev-ratio", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--config", default="config.cfg")
+    parser.add_argument("--skip-train", action="store_true", help="Stop after building the .spacy shards")
+    # Anything else (e.g. --training.max_steps 2000) is passed to 'spacy train'
+    args, train_args = parser.parse_known_args()
+    # 0 would make ShardWriter write one unsharded file that the generate
+    # stage never finds again, so it would regenerate on every run
+    if args.shard_size < 1:
+        print("ERROR: --shard-size must be at least 1.")
+        exit(1)
+
+    report = PipelineRunner(args, train_args).run()
+    print(f"Saved build report to {os.path.join(args.workdir, 'build_report.json')}")
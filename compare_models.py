@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import time
+
+import spacy
+from spacy.tokens import DocBin
+from spacy.training import Example
+
+# What "good enough" means for us: the intents and the slots that
+# fly / capture / hover commands depend on
+FLOOR_INTENTS = ["fly", "capture", "hover"]
+FLOOR_SLOTS = ["DISTANCE", "DIRECTION", "COUNT", "DURATION"]
+
+
+# --- 1. Accuracy ---
+def load_gold(path, vocab):
+    return list(DocBin().from_disk(path).get_docs(vocab))
+
+def score_model(nlp, gold_docs):
+    examples = [Example(nlp.make_doc(doc.text), doc) for doc in gold_docs]
+    scores = nlp.evaluate(examples)
+    return {
+        "ents_f": scores.get("ents_f") or 0.0,
+        "cats_micro_f": scores.get("cats_micro_f") or 0.0,
+        "ents_per_type": {label: s["f"] for label, s in (scores.get("ents_per_type") or {}).items()},
+        "cats_f_per_type": {label: s["f"] for label, s in (scores.get("cats_f_per_type") or {}).items()},
+    }
+
+
+# --- 2. Speed ---
+def measure_speed(nlp, texts, batch_size, min_seconds):
+    """Commands/sec with nlp.pipe, repeating the texts for at least min_seconds."""
+    list(nlp.pipe(texts[:50], batch_size=batch_size))  # warm up
+    done = 0
+    start = time.perf_counter()
+    while True:
+        for _ in nlp.pipe(texts, batch_size=batch_size):
+            done += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return done / elapsed
+
+
+def meets_floor(result, floor):
+    failed = []
+    for intent in FLOOR_INTENTS:
+        if result["cats_f_per_type"].get(intent, 0.0) < floor:
+            failed.append(intent)
+    for slot in FLOOR_SLOTS:
+        if result["ents_per_type"].get(slot, 0.0) < floor:
+            failed.append(slot)
+    return failed
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare trained models on per-label F1 and commands/sec. "
+                    "Train the fast profile with: python -m spacy train config_fast.cfg "
+                    "--output model_output_fast --paths.train train_1000.spacy --paths.dev dev_1000.spacy"
+    )
+    parser.add_argument("--models", nargs="+",
+                        default=["model_output_1000/model-best", "model_output_fast/model-best"])
+    parser.add_argument("--data", default="dev_1000.spacy", help="Gold .spacy file to score against")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--min-seconds", type=float, default=3.0, help="Minimum time spent measuring speed")
+    parser.add_argument("--floor", type=float, default=0.95,
+                        help="Lowest F1 allowed for the fly/capture/hover intents and their slots")
+    parser.add_argument("--output", default="model_comparison.json")
+    args = parser.parse_args()
+
+    results = {}
+    for model_path in args.models:
+        if not os.path.exists(model_path):
+            print(f"Skipping {model_path}: not found.")
+            continue
+        nlp = spacy.load(model_path)
+        gold = load_gold(args.data, nlp.vocab)
+        result = score_model(nlp, gold)
+        result["commands_per_sec"] = measure_speed(nlp, [doc.text for doc in gold], args.batch_size, args.min_seconds)
+        result["below_floor"] = meets_floor(result, args.floor)
+        results[model_path] = result
+
+    if not results:
+        print("ERROR: none of the models could be found.")
+        exit(1)
+
+    # --- Side-by-side table ---
+    names = list(results)
+    labels = sorted({l for r in results.values() for l in r["cats_f_per_type"]}) + \
+        sorted({l for r in results.values() for l in r["ents_per_type"]})
+    width = max(len(name) for name in names) + 2
+    print(f"{'':<14}" + "".join(f"{name:>{width}}" for name in names))
+    print(f"{'commands/sec':<14}" + "".join(f"{results[n]['commands_per_sec']:>{width}.0f}" for n in names))
+    for label in labels:
+        row = []
+        for name in names:
+            scores = results[name]["cats_f_per_type"] if label.islower() else results[name]["ents_per_type"]
+            row.append(f"{scores.get(label, 0.0):>{width}.3f}")
+        print(f"{label:<14}" + "".join(row))
+
+    # --- Recommendation ---
+    passing = [name for name in names if not results[name]["below_floor"]]
+    if passing:
+        best = max(passing, key=lambda name: results[name]["commands_per_sec"])
+        print(f"\nFastest model meeting the {args.floor} F1 floor: {best}")
+    else:
+        best = None
+        print(f"\nNo model meets the {args.floor} F1 floor.")
+        for name in names:
+            print(f"  {name}: below floor on {', '.join(results[name]['below_floor'])}")
+
+    with open(args.output, "w") as f:
+        json.dump({"floor": args.floor, "recommended": best, "models": results}, f, indent=2)
+    print(f"Saved comparison to {args.output}")
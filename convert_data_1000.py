@@ -1,76 +1,230 @@
+import argparse
 import json
+import multiprocessing
+import os
 import random
 import warnings
-from spacy.tokens import DocBin, Doc
-from spacy.training import Example
+from spacy.tokens import DocBin
 import spacy
 
-def convert_to_docbin(data, nlp):
+# Each worker makes its own tokenizer-only pipeline (see init_worker)
+_NLP = None
+
+def new_report():
+    return {
+        "examples": 0,
+        "train": 0,
+        "dev": 0,
+        "spans_total": 0,
+        "spans_kept": 0,
+        "spans_misaligned": 0,     # doc.char_span(...) was None
+        "spans_overlapping": 0,    # lost because doc.ents rejected the set
+        "examples_with_drops": 0,
+        "samples": [],
+    }
+
+def merge_reports(total, part, max_samples=10):
+    for key, value in part.items():
+        if key == "samples":
+            total["samples"].extend(value[:max_samples - len(total["samples"])])
+        else:
+            total[key] += value
+
+def convert_to_docbin(data, nlp, report=None):
     """
     Converts our JSON data into a spaCy DocBin object.
     This is the official format for spaCy 3+ training.
+    Entities that can't be used are counted in `report` (see new_report).
     """
+    if report is None:
+        report = new_report()
     db = DocBin()
-    
+
     for text, annots in data:
         doc = nlp.make_doc(text)
-        ents = []
-        
+        entities = annots.get("entities", [])
+        report["examples"] += 1
+        report["spans_total"] += len(entities)
+
         # Handle Slots (Entities)
         spans = []
-        for start, end, label in annots.get("entities", []):
+        dropped = []
+        for start, end, label in entities:
             span = doc.char_span(start, end, label=label)
             if span is None:
-                # print(f"Skipping entity: {text[start:end]} in '{text}'")
-                pass
+                # Doesn't line up with token boundaries
+                report["spans_misaligned"] += 1
+                dropped.append([start, end, label, "misaligned"])
             else:
                 spans.append(span)
-        
+
         try:
             doc.ents = spans
-        except Exception as e:
+            report["spans_kept"] += len(spans)
+        except Exception:
             # Catches overlapping entity errors
-            # print(f"Warning: {e} in text '{text}'")
-            pass
-        
+            report["spans_overlapping"] += len(spans)
+            dropped.extend([span.start_char, span.end_char, span.label_, "overlapping"] for span in spans)
+
+        if dropped:
+            report["examples_with_drops"] += 1
+            if len(report["samples"]) < 10:
+                report["samples"].append({"text": text, "dropped": dropped})
+
         # Handle Intents (Categories)
         doc.cats = annots.get("cats", {})
-        
+
         db.add(doc)
     return db
 
+# --- Streaming Input ---
+def read_examples(path):
+    """
+    Yields (text, annotations) one at a time. JSONL files are read line by
+    line and .dtb files (training_data_store.py) are memory-mapped; the old
+    indented .json file still works but is loaded in one go.
+    """
+    if path.endswith(".dtb"):
+        from training_data_store import TrainingDataStore
+        with TrainingDataStore(path) as store:
+            yield from store
+    elif path.endswith(".jsonl"):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path) as f:
+            yield from json.load(f)
+
+def read_chunks(examples, chunk_size):
+    chunk = []
+    for example in examples:
+        chunk.append(example)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# --- Shard Conversion ---
+def init_worker():
+    global _NLP
+    # We only need the tokenizer (same rules as en_core_web_sm's)
+    _NLP = spacy.blank("en")
+    # Suppress spaCy warnings
+    warnings.filterwarnings("ignore", message=r".*\[W111\].*")
+
+def convert_split(job):
+    """Writes one shard's train and dev DocBins from examples that are already split."""
+    train_examples, dev_examples, train_path, dev_path = job
+    report = new_report()
+    convert_to_docbin(train_examples, _NLP, report).to_disk(train_path)
+    report["train"] = report["examples"]
+    convert_to_docbin(dev_examples, _NLP, report).to_disk(dev_path)
+    report["dev"] = report["examples"] - report["train"]
+    return report
+
+def convert_chunk(job):
+    """
+    Shuffles one chunk, splits it 80/20 and writes its train/dev DocBins.
+    The shuffle is seeded per chunk so the result doesn't depend on how
+    many workers there are.
+    """
+    chunk_index, examples, train_path, dev_path, dev_ratio, seed = job
+    random.Random(f"{seed}:{chunk_index}").shuffle(examples)
+    split_point = int(len(examples) * (1 - dev_ratio))
+    return convert_split((examples[:split_point], examples[split_point:], train_path, dev_path))
+
+def store_jobs(path, train_output, dev_output, shard_size, dev_ratio, seed, lazy):
+    """
+    convert_split jobs for a .dtb file: one shuffled split of the whole
+    store (TrainingDataStore.split), cut into shards. With lazy=True the
+    examples are streamed from the memory-mapped file by take(); otherwise
+    each shard is read into lists so it can be sent to a worker.
+    """
+    import numpy as np
+    from training_data_store import TrainingDataStore
+
+    with TrainingDataStore(path) as store:
+        train_ids, dev_ids = store.split(dev_ratio, seed)
+        sharded = shard_size > 0
+        n_shards = max(1, -(-len(store) // shard_size)) if sharded else 1
+        for i, (train, dev) in enumerate(zip(np.array_split(train_ids, n_shards), np.array_split(dev_ids, n_shards))):
+            train, dev = store.take(train), store.take(dev)
+            if not lazy:
+                train, dev = list(train), list(dev)
+            yield train, dev, shard_path(train_output, i, sharded), shard_path(dev_output, i, sharded)
+
+def shard_path(output, index, sharded):
+    if not sharded:
+        return output
+    name = os.path.splitext(os.path.basename(output))[0]
+    return os.path.join(output, f"{name}-{index:05d}.spacy")
+
 # --- Main Execution ---
 if __name__ == "__main__":
-    # Load the same base model we'll use for training
-    nlp = spacy.load("en_core_web_sm") 
-    print("Loaded base model 'en_core_web_sm'.")
-    
-    # 1. Load our NEW JSON data
-    try:
-        with open("spacy_training_data_1000.json", "r") as f:
-            TRAIN_DATA = json.load(f)
-        print(f"Loaded {len(TRAIN_DATA)} examples from spacy_training_data_1000.json.")
-    except FileNotFoundError:
-        print("ERROR: spacy_training_data_1000.json not found!")
+    parser = argparse.ArgumentParser(description="Convert annotated commands to .spacy files")
+    parser.add_argument("--input", default="spacy_training_data_1000.json",
+                        help="Annotations from spacy_training_data_1000.py (.json, .jsonl or .dtb)")
+    parser.add_argument("--train-output", default="./train_1000.spacy")
+    parser.add_argument("--dev-output", default="./dev_1000.spacy")
+    parser.add_argument("--shard-size", type=int, default=0,
+                        help="Examples per shard; outputs become directories of .spacy files (0 = one file each)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--dev-ratio", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", default="convert_report.json", help="Where to save the dropped-span report")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"ERROR: {args.input} not found!")
         print("Please make sure you ran spacy_training_data_1000.py first!")
         exit()
 
-    # 2. Shuffle and split the data (80% train, 20% dev)
-    random.shuffle(TRAIN_DATA)
-    split_point = int(len(TRAIN_DATA) * 0.8)
-    train_data = TRAIN_DATA[:split_point]
-    dev_data = TRAIN_DATA[split_point:]
+    sharded = args.shard_size > 0
+    if sharded:
+        os.makedirs(args.train_output, exist_ok=True)
+        os.makedirs(args.dev_output, exist_ok=True)
 
-    print(f"Splitting data: {len(train_data)} training, {len(dev_data)} development.")
+    # 1. Stream the examples in chunks (a single chunk when not sharding).
+    # A .dtb store is split as a whole and read straight from the file.
+    if args.input.endswith(".dtb"):
+        convert = convert_split
+        jobs = store_jobs(args.input, args.train_output, args.dev_output, args.shard_size, args.dev_ratio,
+                          args.seed, lazy=args.workers <= 1)
+    else:
+        convert = convert_chunk
+        chunk_size = args.shard_size if sharded else float("inf")
+        jobs = (
+            (i, chunk, shard_path(args.train_output, i, sharded), shard_path(args.dev_output, i, sharded),
+             args.dev_ratio, args.seed)
+            for i, chunk in enumerate(read_chunks(read_examples(args.input), chunk_size))
+        )
 
-    # 3. Suppress spaCy warnings
-    warnings.filterwarnings("ignore", message=r".*\[W111\].*")
-    
-    # 4. Create and save the .spacy files with new names
-    db_train = convert_to_docbin(train_data, nlp)
-    db_train.to_disk("./train_1000.spacy")
-    print("Created and saved train_1000.spacy")
-
-    db_dev = convert_to_docbin(dev_data, nlp)
-    db_dev.to_disk("./dev_1000.spacy")
-    print("Created and saved dev_1000.spacy")
\ No newline at end of file
+    # 2. Shuffle, split and convert each chunk
+    report = new_report()
+    if args.workers <= 1:
+        init_worker()
+        for job in jobs:
+            merge_reports(report, convert(job))
+    else:
+        # Hand out a few chunks at a time so memory stays bounded
+        window = args.workers * 2
+        with multiprocessing.Pool(args.workers, initializer=init_worker) as pool:
+            while True:
+                batch = [job for _, job in zip(range(window), jobs)]
+                if not batch:
+                    break
+                for part in pool.imap(convert, batch):
+                    merge_reports(report, part)
+
+    print(f"Converted {report['examples']} examples: {report['train']} training, {report['dev']} development.")
+    print(f"Saved {args.train_output} and {args.dev_output}")
+
+    # 3. Report what could not be used
+    print(f"Entities kept: {report['spans_kept']}/{report['spans_total']} "
+          f"(misaligned: {report['spans_misaligned']}, overlapping: {report['spans_overlapping']})")
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved conversion report to {args.report}")
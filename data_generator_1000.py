@@ -1,29 +1,45 @@
-import pandas as pd
+import argparse
+import csv
+import hashlib
+import json
+import math
+import multiprocessing
+import os
 import random
 
-data = []
 columns = ["command", "intent", "direction", "distance", "duration", "task", "count"]
 
-print("Generating 1000+ drone commands...")
-
 # --- 1. Define our "ingredients" ---
 simple_directions = ["north", "south", "east", "west", "up", "down", "forward", "backward", "left", "right"]
 diag_directions = ["north-east", "north-west", "south-east", "south-west", "NE", "NW", "SE", "SW", "north east", "north west", "south east", "south west"]
 all_directions = simple_directions + diag_directions
 
-distances = [f"{random.randint(5, 300)}m" for _ in range(20)] + \
-            [f"{random.randint(20, 500)}ft" for _ in range(10)] + \
-            [f"{random.uniform(0.5, 3.0):.1f}km" for _ in range(5)]
+count_words = ["pictures", "photos", "images", "shots", "pics"]
 
-durations = [f"{random.randint(5, 60)}s" for _ in range(10)] + \
-            [f"{random.randint(1, 10)}m" for _ in range(5)] + \
-            [f"{random.randint(2, 20)} seconds" for _ in range(5)] + \
-            [f"{random.randint(1, 5)} minutes" for _ in range(5)]
+# Values are drawn per row (not from a fixed list of 35) so that large
+# datasets keep producing new commands. The weights match the old lists.
+def random_distance(rng):
+    kind = rng.choices(["m", "ft", "km"], weights=[20, 10, 5])[0]
+    if kind == "m":
+        return f"{rng.randint(5, 300)}m"
+    if kind == "ft":
+        return f"{rng.randint(20, 500)}ft"
+    return f"{rng.uniform(0.5, 3.0):.1f}km"
 
-counts = [str(random.randint(1, 20)) for _ in range(15)]
-count_words = ["pictures", "photos", "images", "shots", "pics"]
+def random_duration(rng):
+    kind = rng.choices(["s", "m", "seconds", "minutes"], weights=[10, 5, 5, 5])[0]
+    if kind == "s":
+        return f"{rng.randint(5, 60)}s"
+    if kind == "m":
+        return f"{rng.randint(1, 10)}m"
+    if kind == "seconds":
+        return f"{rng.randint(2, 20)} seconds"
+    return f"{rng.randint(1, 5)} minutes"
 
-# --- 2. Generate FLY Commands (approx. 400) ---
+def random_count(rng):
+    return str(rng.randint(1, 20))
+
+# --- 2. Templates ---
 fly_templates = [
     ("fly {dist} {dir}", "fly", "{dir}", "{dist}", "-", "-", "-"),
     ("go {dist} {dir}", "fly", "{dir}", "{dist}", "-", "-", "-"),
@@ -38,18 +54,7 @@ fly_templates = [
     ("fly {dist}", "fly", "-", "{dist}", "-", "-", "-"),
     ("go {dist}", "fly", "-", "{dist}", "-", "-", "-"),
 ]
-for _ in range(400):
-    tpl, intent, dir_val, dist_val, dur_val, task_val, count_val = random.choice(fly_templates)
-    d = random.choice(all_directions)
-    dist = random.choice(distances)
-    
-    cmd_str = tpl.format(dist=dist, dir=d)
-    dir_val = dir_val.format(dir=d) if "{dir}" in dir_val else dir_val
-    dist_val = dist_val.format(dist=dist) if "{dist}" in dist_val else dist_val
-    
-    data.append([cmd_str, intent, dir_val, dist_val, dur_val, task_val, count_val])
-
-# --- 3. Generate CAPTURE Commands (approx. 150) ---
+
 capture_templates = [
     ("take {count} {c_word}", "capture", "-", "-", "-", "capture", "{count}"),
     ("snap {count} {c_word}", "capture", "-", "-", "-", "capture", "{count}"),
@@ -59,60 +64,24 @@ capture_templates = [
     ("take {count} {c_word} of the {dir} side", "capture", "{dir}", "-", "-", "capture", "{count}"),
     ("get me {count} {c_word}", "capture", "-", "-", "-", "capture", "{count}"),
 ]
-for _ in range(150):
-    tpl, intent, dir_val, dist_val, dur_val, task_val, count_val = random.choice(capture_templates)
-    c = random.choice(counts)
-    d = random.choice(simple_directions) # Keep capture directions simple
-    c_word = random.choice(count_words)
-
-    cmd_str = tpl.format(count=c, dir=d, c_word=c_word)
-    dir_val = dir_val.format(dir=d) if "{dir}" in dir_val else dir_val
-    count_val = count_val.format(count=c) if "{count}" in count_val else count_val
-    
-    data.append([cmd_str, intent, dir_val, dist_val, dur_val, task_val, count_val])
-
-# --- 4. Generate HOVER Commands (approx. 100) ---
+
 hover_templates = [
     ("hover for {dur}", "hover", "-", "-", "{dur}", "-", "-"),
     ("stay still for {dur}", "hover", "-", "-", "{dur}", "-", "-"),
     ("hold position for {dur}", "hover", "-", "-", "{dur}", "-", "-"),
     ("hover in place", "hover", "-", "-", "-", "-", "-"),
 ]
-for _ in range(100):
-    tpl, intent, dir_val, dist_val, dur_val, task_val, count_val = random.choice(hover_templates)
-    dur = random.choice(durations)
-    
-    cmd_str = tpl.format(dur=dur)
-    dur_val = dur_val.format(dur=dur) if "{dur}" in dur_val else dur_val
-    
-    data.append([cmd_str, intent, dir_val, dist_val, dur_val, task_val, count_val])
-
-# --- 5. Generate Other Simple Commands (approx. 150) ---
-for intent in ["scan", "return", "land", "start", "stop", "takeoff"]:
-    cmd_templates = {
-        "scan": ["scan the area", "scan surroundings", "scan for {dur}", "scan the {dir} side for {dur}"],
-        "return": ["return to base", "go home", "return to launch", "come back now", "RTL"],
-        "land": ["land", "land the drone", "touchdown", "land at home base"],
-        "start": ["start mission", "begin", "start recording", "start scan", "initiate sequence"],
-        "stop": ["stop", "halt", "stop recording", "abort mission", "emergency stop"],
-        "takeoff": ["take off", "launch", "get in the air", "initiate takeoff"]
-    }
-    task_map = {"scan": "scan", "start": "record", "stop": "record"}
-
-    for _ in range(25): # 25 examples for each
-        cmd_str = random.choice(cmd_templates[intent])
-        d = random.choice(simple_directions)
-        dur = random.choice(durations)
-        
-        cmd_str = cmd_str.format(dur=dur, dir=d)
-        
-        dir_val = d if "{dir}" in cmd_str else "-"
-        dur_val = dur if "{dur}" in cmd_str else "-"
-        task_val = task_map.get(intent, "-")
-
-        data.append([cmd_str, intent, dir_val, "-", dur_val, task_val, "-"])
-
-# --- 6. Generate COMPLEX/COMPOUND Commands (approx. 200) ---
+
+cmd_templates = {
+    "scan": ["scan the area", "scan surroundings", "scan for {dur}", "scan the {dir} side for {dur}"],
+    "return": ["return to base", "go home", "return to launch", "come back now", "RTL"],
+    "land": ["land", "land the drone", "touchdown", "land at home base"],
+    "start": ["start mission", "begin", "start recording", "start scan", "initiate sequence"],
+    "stop": ["stop", "halt", "stop recording", "abort mission", "emergency stop"],
+    "takeoff": ["take off", "launch", "get in the air", "initiate takeoff"]
+}
+task_map = {"scan": "scan", "start": "record", "stop": "record"}
+
 # This is key to fixing our bugs!
 compound_templates = [
     ("fly {dist} {dir} and take {count} {c_word}", "fly", "{dir}", "{dist}", "-", "capture", "{count}"),
@@ -125,30 +94,225 @@ compound_templates = [
     ("hover for {dur} then take {count} {c_word}", "hover", "-", "-", "{dur}", "capture", "{count}"),
 ]
 
-for _ in range(200):
-    tpl, intent, dir_val, dist_val, dur_val, task_val, count_val = random.choice(compound_templates)
-    d = random.choice(all_directions) # Use all directions here
-    dist = random.choice(distances)
-    dur = random.choice(durations)
-    c = random.choice(counts)
-    c_word = random.choice(count_words)
+# --- 3. Row Builders (one per command family) ---
+def fill(template, values):
+    return template.format(**values) if "{" in template else template
+
+def make_fly(rng):
+    tpl, intent, dir_val, dist_val, dur_val, task_val, count_val = rng.choice(fly_templates)
+    values = {"dir": rng.choice(all_directions), "dist": random_distance(rng)}
+    return [fill(tpl, values), intent, fill(dir_val, values), fill(dist_val, values), dur_val, task_val, count_val]
+
+def make_capture(rng):
+    tpl, intent, dir_val, dist_val, dur_val, task_val, count_val = rng.choice(capture_templates)
+    values = {
+        "count": random_count(rng),
+        "dir": rng.choice(simple_directions), # Keep capture directions simple
+        "c_word": rng.choice(count_words),
+    }
+    return [fill(tpl, values), intent, fill(dir_val, values), dist_val, dur_val, task_val, fill(count_val, values)]
+
+def make_hover(rng):
+    tpl, intent, dir_val, dist_val, dur_val, task_val, count_val = rng.choice(hover_templates)
+    values = {"dur": random_duration(rng)}
+    return [fill(tpl, values), intent, dir_val, dist_val, fill(dur_val, values), task_val, count_val]
+
+def make_other(rng):
+    intent = rng.choice(list(cmd_templates))
+    tpl = rng.choice(cmd_templates[intent])
+    d = rng.choice(simple_directions)
+    dur = random_duration(rng)
+    dir_val = d if "{dir}" in tpl else "-"
+    dur_val = dur if "{dur}" in tpl else "-"
+    return [tpl.format(dur=dur, dir=d), intent, dir_val, "-", dur_val, task_map.get(intent, "-"), "-"]
+
+def make_compound(rng):
+    tpl, intent, dir_val, dist_val, dur_val, task_val, count_val = rng.choice(compound_templates)
+    values = {
+        "dir": rng.choice(all_directions), # Use all directions here
+        "dist": random_distance(rng),
+        "dur": random_duration(rng),
+        "count": random_count(rng),
+        "c_word": rng.choice(count_words),
+    }
+    return [fill(tpl, values), intent, fill(dir_val, values), fill(dist_val, values),
+            fill(dur_val, values), task_val, fill(count_val, values)]
+
+# Same mix as the original 400/150/100/150/200 blocks
+ROW_BUILDERS = [make_fly, make_capture, make_hover, make_other, make_compound]
+ROW_WEIGHTS = [400, 150, 100, 150, 200]
+
+def generate_chunk(seed, chunk_index, chunk_size):
+    """
+    Rows for one chunk. Each chunk has its own RNG derived from the seed
+    and its index, so the output doesn't depend on the number of workers.
+    """
+    rng = random.Random(f"{seed}:{chunk_index}")
+    builders = rng.choices(ROW_BUILDERS, weights=ROW_WEIGHTS, k=chunk_size)
+    return [build(rng) for build in builders]
+
+def _generate_chunk_job(args):
+    return generate_chunk(*args)
+
+def generate_rows(n_rows, seed=0, chunk_size=10000, workers=1):
+    """Streams n_rows raw rows (duplicates included) chunk by chunk."""
+    n_chunks = math.ceil(n_rows / chunk_size)
+    jobs = [(seed, i, min(chunk_size, n_rows - i * chunk_size)) for i in range(n_chunks)]
+
+    if workers <= 1:
+        for job in jobs:
+            yield from _generate_chunk_job(job)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        # Only keep a couple of chunks per worker in flight so memory stays flat
+        window = workers * 2
+        for start in range(0, len(jobs), window):
+            for rows in pool.imap(_generate_chunk_job, jobs[start:start + window]):
+                yield from rows
+
+# --- 4. Bounded De-duplication ---
+class BloomFilter:
+    """
+    Fixed-size set of seen commands. May (rarely, at about error_rate) call a
+    new command a duplicate, but never lets a real duplicate through, and
+    its memory does not grow with the number of rows.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.n_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.n_hashes = max(1, round(self.n_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.n_bits + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.n_bits for i in range(self.n_hashes)]
+
+    def add(self, item):
+        """Adds item and returns True if it was (probably) already there."""
+        seen = True
+        for pos in self._positions(item):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                seen = False
+                self.bits[byte] |= 1 << bit
+        return seen
+
+# --- 5. Chunked Output ---
+class ShardWriter:
+    """
+    Writes rows to CSV, JSONL or Parquet. With shard_size > 0 the output
+    path is a directory and a new file is started every shard_size rows.
+    """
+
+    def __init__(self, output, fmt="csv", shard_size=0):
+        self.output = output
+        self.fmt = fmt
+        self.shard_size = shard_size
+        self.shard_index = 0
+        self.rows_in_shard = 0
+        self.total = 0
+        self.paths = []
+        self.is_open = False
+        self.file = None
+        self.writer = None
+        self.pending = []
+        if shard_size:
+            os.makedirs(output, exist_ok=True)
+
+    def _open(self):
+        if self.shard_size:
+            path = os.path.join(self.output, f"commands-{self.shard_index:05d}.{self.fmt}")
+        else:
+            path = self.output
+        self.paths.append(path)
+        self.rows_in_shard = 0
+        self.is_open = True
+
+        if self.fmt == "parquet":
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow).")
+            schema = pa.schema([(name, pa.string()) for name in columns])
+            self.writer = pq.ParquetWriter(path, schema)
+        else:
+            self.file = open(path, "w", newline="")
+            if self.fmt == "csv":
+                self.writer = csv.writer(self.file)
+                self.writer.writerow(columns)
+
+    def _close(self):
+        if self.fmt == "parquet":
+            self._flush_parquet()
+            self.writer.close()
+        else:
+            self.file.close()
+        self.file = None
+        self.writer = None
+        self.is_open = False
+        self.shard_index += 1
+
+    def _flush_parquet(self):
+        if self.pending:
+            import pyarrow as pa
+            table = pa.Table.from_pylist([dict(zip(columns, row)) for row in self.pending])
+            self.writer.write_table(table)
+            self.pending = []
+
+    def write(self, row):
+        if not self.is_open:
+            self._open()
+
+        if self.fmt == "csv":
+            self.writer.writerow(row)
+        elif self.fmt == "jsonl":
+            self.file.write(json.dumps(dict(zip(columns, row))) + "\n")
+        else:
+            self.pending.append(row)
+            if len(self.pending) >= 10000:
+                self._flush_parquet()
 
-    cmd_str = tpl.format(dist=dist, dir=d, dur=dur, count=c, c_word=c_word)
-    dir_val = dir_val.format(dir=d) if "{dir}" in dir_val else dir_val
-    dist_val = dist_val.format(dist=dist) if "{dist}" in dist_val else dist_val
-    dur_val = dur_val.format(dur=dur) if "{dur}" in dur_val else dur_val
-    count_val = count_val.format(count=c) if "{count}" in count_val else count_val
+        self.rows_in_shard += 1
+        self.total += 1
+        if self.shard_size and self.rows_in_shard >= self.shard_size:
+            self._close()
 
-    data.append([cmd_str, intent, dir_val, dist_val, dur_val, task_val, count_val])
+    def close(self):
+        if self.is_open:
+            self._close()
 
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic drone commands")
+    parser.add_argument("--rows", type=int, default=1000, help="Rows to generate before removing duplicates")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--format", choices=["csv", "jsonl", "parquet"], default="csv")
+    parser.add_argument("--output", default="drone_commands_1000.csv",
+                        help="Output file, or a directory when --shard-size is set")
+    parser.add_argument("--shard-size", type=int, default=0, help="Rows per output file (0 = one file)")
+    parser.add_argument("--no-dedupe", action="store_true", help="Keep duplicate commands")
+    parser.add_argument("--bloom-error", type=float, default=0.001,
+                        help="False-positive rate of the duplicate filter")
+    args = parser.parse_args()
 
-# --- 7. Create and Save DataFrame ---
-df = pd.DataFrame(data, columns=columns)
-# Remove any accidental duplicates
-df = df.drop_duplicates(subset=["command"])
+    print(f"Generating {args.rows} drone commands (seed={args.seed}, workers={args.workers})...")
 
-# Save to CSV
-df.to_csv("drone_commands_1000.csv", index=False)
+    # Remove any accidental duplicates
+    seen = None if args.no_dedupe else BloomFilter(args.rows, args.bloom_error)
+    writer = ShardWriter(args.output, args.format, args.shard_size)
+    duplicates = 0
+    for row in generate_rows(args.rows, args.seed, args.chunk_size, args.workers):
+        if seen is not None and seen.add(row[0]):
+            duplicates += 1
+            continue
+        writer.write(row)
+    writer.close()
 
-print(f"Dataset created successfully: drone_commands_1000.csv")
-print(f"Total commands generated: {len(df)}")
\ No newline at end of file
+    print(f"Dataset created successfully: {', '.join(writer.paths) if len(writer.paths) <= 3 else args.output}")
+    print(f"Total commands generated: {writer.total} ({duplicates} duplicates dropped)")
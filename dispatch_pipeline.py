@@ -0,0 +1,279 @@
+import argparse
+import asyncio
+import time
+
+from drone_parser import DEFAULT_BATCH_SIZE, load_model, parse_commands
+from fleet_state import FleetState
+from rule_parser import RuleParser
+
+# Commands outside these limits are parsed fine but never sent
+DEFAULT_LIMITS = {
+    "distance_meters": 1000.0,
+    "duration_seconds": 600.0,
+    "count": 100,
+}
+
+
+# --- 1. Mock Flight Controller ---
+class MockFlightController:
+    """
+    In-process stand-in for the link to the drones. Each send waits for
+    `latency` seconds (the radio round trip), then moves the drone in a
+    FleetState and remembers what each drone received, in order.
+    """
+
+    def __init__(self, n_drones, latency=0.002, telemetry=None):
+        self.fleet = FleetState(n_drones)
+        self.latency = latency
+        self.telemetry = telemetry
+        self.received = {}
+
+    async def send(self, drone_id, command):
+        await asyncio.sleep(self.latency)
+        self.fleet.apply_commands([drone_id], [command])
+        self.received.setdefault(drone_id, []).append(command)
+        if self.telemetry is not None:
+            self.telemetry.append(drone_id, command, self.fleet.positions[drone_id])
+        return {"ack": True, "position": self.fleet.positions[drone_id].tolist()}
+
+
+# --- 2. Queue Statistics ---
+class StageQueue:
+    """An asyncio.Queue that also tracks its peak depth and how long items wait in it."""
+
+    def __init__(self, name, maxsize):
+        self.name = name
+        self.queue = asyncio.Queue(maxsize)
+        self.peak = 0
+        self.items = 0
+        self.wait_seconds = 0.0
+
+    async def put(self, item):
+        await self.queue.put((time.perf_counter(), item))
+        self.peak = max(self.peak, self.queue.qsize())
+
+    def _taken(self, queued_at, item):
+        # None is the shutdown marker, not a command
+        if item is not None:
+            self.items += 1
+            self.wait_seconds += time.perf_counter() - queued_at
+        return item
+
+    async def get(self):
+        return self._taken(*await self.queue.get())
+
+    def get_nowait(self):
+        return self._taken(*self.queue.get_nowait())
+
+    def stats(self):
+        return {
+            "depth": self.queue.qsize(),
+            "maxsize": self.queue.maxsize,
+            "peak": self.peak,
+            "items": self.items,
+            "mean_wait_ms": 1000 * self.wait_seconds / self.items if self.items else 0.0,
+        }
+
+
+# --- 3. The Pipeline ---
+class DispatchPipeline:
+    """
+    ingest -> batched parse -> validate -> dispatch, as asyncio tasks
+    joined by bounded queues. When a stage falls behind its input queue
+    fills up and submit() waits, so memory stays bounded.
+
+    Parsing runs in a thread (or in a ParserPool), so the event loop keeps
+    validating and sending while the model works on the next batch.
+    Dispatch is split into shards by drone id: a drone's commands always
+    go through the same shard, so they reach the controller in the order
+    they were submitted.
+
+        pipeline = DispatchPipeline(nlp, controller, rules=RuleParser())
+        await pipeline.start()
+        outcome = await pipeline.submit(3, "fly 50m north")
+        await pipeline.close()
+    """
+
+    def __init__(self, nlp, controller, rules=None, cache=None, pool=None, batch_size=DEFAULT_BATCH_SIZE,
+                 max_wait=0.005, queue_size=1024, n_dispatchers=4, limits=DEFAULT_LIMITS):
+        self.nlp = nlp
+        self.controller = controller
+        self.rules = rules
+        self.cache = cache
+        self.pool = pool
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.queue_size = queue_size
+        self.n_dispatchers = n_dispatchers
+        self.limits = limits
+        self.counts = {"submitted": 0, "dispatched": 0, "rejected": 0, "invalid": 0, "failed": 0}
+        self.tasks = []
+
+    async def start(self):
+        self.parse_queue = StageQueue("parse", self.queue_size)
+        self.validate_queue = StageQueue("validate", self.queue_size)
+        self.dispatch_queues = [StageQueue(f"dispatch-{i}", self.queue_size // self.n_dispatchers or 1)
+                                for i in range(self.n_dispatchers)]
+        self.tasks = [asyncio.create_task(self._parse_stage()), asyncio.create_task(self._validate_stage())]
+        self.tasks += [asyncio.create_task(self._dispatch_stage(q)) for q in self.dispatch_queues]
+        return self
+
+    # --- Stage 1: ingest ---
+    async def submit(self, drone_id, text):
+        """Queues one command. Waits while the pipeline is full; returns a Future of the outcome."""
+        future = asyncio.get_running_loop().create_future()
+        self.counts["submitted"] += 1
+        await self.parse_queue.put({"drone": drone_id, "text": text, "future": future})
+        return future
+
+    # --- Stage 2: batched parse ---
+    async def _next_batch(self):
+        first = await self.parse_queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.batch_size:
+            try:
+                item = self.parse_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(min(remaining, 0.001))
+                continue
+            if item is None:
+                # Put the sentinel back for the next round
+                await self.parse_queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    async def _parse_stage(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                batch = await self._next_batch()
+                if batch is None:
+                    break
+                texts = [item["text"] for item in batch]
+                try:
+                    results = await loop.run_in_executor(
+                        None, lambda: parse_commands(self.nlp, texts, batch_size=self.batch_size, rules=self.rules,
+                                                     cache=self.cache, pool=self.pool))
+                except Exception as e:
+                    # Fail this batch but keep the stage running for the next one
+                    for item in batch:
+                        self._finish(item, "failed", reason=f"Parse failed: {type(e).__name__}: {e}")
+                    continue
+                for item, result in zip(batch, results):
+                    item["result"] = result
+                    await self.validate_queue.put(item)
+        finally:
+            # The later stages stop on this, even if parsing broke
+            await self.validate_queue.put(None)
+
+    # --- Stage 3: validate ---
+    def validate(self, command):
+        """Returns a reason the command must not be sent, or None."""
+        if command.get("command") == "REJECT":
+            return command.get("reason", "Rejected by the parser.")
+        for field, limit in self.limits.items():
+            value = command.get(field)
+            if value is not None and not 0 <= value <= limit:
+                return f"{field} {value} is outside 0-{limit}."
+        return None
+
+    def _finish(self, item, status, **outcome):
+        self.counts[status] += 1
+        if not item["future"].done():
+            item["future"].set_result(dict(outcome, status=status, drone=item["drone"], text=item["text"]))
+
+    async def _validate_stage(self):
+        while True:
+            item = await self.validate_queue.get()
+            if item is None:
+                break
+            command = item["result"]["final_command"]
+            reason = self.validate(command)
+            if reason is not None:
+                status = "rejected" if command.get("command") == "REJECT" else "invalid"
+                self._finish(item, status, final_command=command, reason=reason)
+                continue
+            await self.dispatch_queues[hash(item["drone"]) % self.n_dispatchers].put(item)
+        for queue in self.dispatch_queues:
+            await queue.put(None)
+
+    # --- Stage 4: dispatch ---
+    async def _dispatch_stage(self, queue):
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            command = item["result"]["final_command"]
+            try:
+                ack = await self.controller.send(item["drone"], command)
+            except Exception as e:
+                self._finish(item, "failed", final_command=command, reason=f"Send failed: {e}")
+                continue
+            self._finish(item, "dispatched", final_command=command, ack=ack)
+
+    async def close(self):
+        """Lets everything already submitted finish, then stops the stages."""
+        await self.parse_queue.put(None)
+        await asyncio.gather(*self.tasks)
+
+    def stats(self):
+        queues = [self.parse_queue, self.validate_queue] + self.dispatch_queues
+        return {"counts": dict(self.counts), "queues": {q.name: q.stats() for q in queues}}
+
+
+# --- 4. Demo / Load Run ---
+async def run_demo(nlp, commands, n_drones, rules, batch_size, queue_size, n_dispatchers, latency):
+    controller = MockFlightController(n_drones, latency)
+    pipeline = await DispatchPipeline(nlp, controller, rules=rules, batch_size=batch_size, queue_size=queue_size,
+                                      n_dispatchers=n_dispatchers).start()
+    start = time.perf_counter()
+    futures = [await pipeline.submit(i % n_drones, text) for i, text in enumerate(commands)]
+    outcomes = await asyncio.gather(*futures)
+    await pipeline.close()
+    seconds = time.perf_counter() - start
+
+    # Every drone must have received its commands in submission order
+    sent = {}
+    for outcome in outcomes:
+        if outcome["status"] == "dispatched":
+            sent.setdefault(outcome["drone"], []).append(outcome["final_command"])
+    assert all(controller.received.get(drone) == cmds for drone, cmds in sent.items()), "Per-drone order broken"
+    return seconds, pipeline.stats()
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run generated commands through the async dispatch pipeline")
+    parser.add_argument("--commands", type=int, default=5000)
+    parser.add_argument("--drones", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--queue-size", type=int, default=1024)
+    parser.add_argument("--dispatchers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.002, help="Mock controller round trip in seconds")
+    parser.add_argument("--no-fast-path", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    nlp = load_model()
+    if nlp is None:
+        print("ERROR: Could not find model files.")
+        exit(1)
+
+    import data_generator_1000
+    commands = [row[0] for row in data_generator_1000.generate_rows(args.commands, args.seed)]
+    rules = None if args.no_fast_path else RuleParser()
+    seconds, stats = asyncio.run(run_demo(nlp, commands, args.drones, rules, args.batch_size, args.queue_size,
+                                          args.dispatchers, args.latency))
+
+    print(f"{len(commands)} commands in {seconds:.2f}s ({len(commands) / seconds:.0f} cmd/s)")
+    print(f"Outcomes: {stats['counts']}")
+    print(f"{'queue':<12}{'peak':>8}{'maxsize':>9}{'items':>8}{'mean wait':>12}")
+    for name, q in stats["queues"].items():
+        print(f"{name:<12}{q['peak']:>8}{q['maxsize']:>9}{q['items']:>8}{q['mean_wait_ms']:>10.2f}ms")
@@ -0,0 +1,286 @@
+import json
+import os
+import time
+
+from slot_normalizer import canonical_direction, normalize_value
+
+DEFAULT_BATCH_SIZE = 64
+
+# Components parse_commands actually uses. Anything else in a model folder
+# (e.g. a parser or lemmatizer copied from en_core_web_sm) is not loaded.
+PARSE_COMPONENTS = ("tok2vec", "ner", "textcat_multilabel")
+
+# Filled in while starting up so apps can report where the time went
+startup_timings = {}
+
+# --- 1. Smart Model Loader ---
+def find_model_path(script_dir=None):
+    """
+    Returns the first folder that looks like a trained DroneTalk model,
+    or None if nothing was found.
+    """
+    # Skip the probing when the deployment says where the model is
+    if os.environ.get("DRONETALK_MODEL"):
+        return os.environ["DRONETALK_MODEL"]
+
+    if script_dir is None:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    # Path 1: The expected path from our project
+    model_path_standard = os.path.join(script_dir, "model_output_1000", "model-best")
+
+    # Path 2: Just the model-best folder in the root
+    model_path_flat = os.path.join(script_dir, "model-best")
+
+    # Path 3: The root directory itself
+    model_path_root = script_dir
+
+    if os.path.exists(model_path_standard):
+        return model_path_standard
+    elif os.path.exists(model_path_flat):
+        return model_path_flat
+    elif os.path.exists(os.path.join(model_path_root, "config.cfg")):
+        return model_path_root
+    return None
+
+def model_pipeline(model_path):
+    """Component names listed in meta.json (read without loading the model)."""
+    meta_path = os.path.join(model_path, "meta.json")
+    if not os.path.exists(meta_path):
+        return []
+    with open(meta_path) as f:
+        return json.load(f).get("pipeline", [])
+
+def load_model(script_dir=None, components=PARSE_COMPONENTS):
+    """
+    Loads the model, keeping only the given components (None keeps all).
+    spaCy is imported here rather than at the top of the file because it is
+    by far the slowest import, and the cache/fast path don't need it.
+    """
+    model_path = find_model_path(script_dir)
+    if model_path is None:
+        return None
+
+    start = time.perf_counter()
+    import spacy
+    startup_timings["import_spacy_s"] = time.perf_counter() - start
+
+    exclude = []
+    if components is not None:
+        exclude = [name for name in model_pipeline(model_path) if name not in components]
+
+    start = time.perf_counter()
+    nlp = spacy.load(model_path, exclude=exclude)
+    startup_timings["load_model_s"] = time.perf_counter() - start
+    return nlp
+
+# --- 2. Command Generator Logic ---
+# Slot values go through slot_normalizer: distances in meters, durations
+# in seconds, counts as whole numbers, whatever unit was spoken.
+def generate_command(parsed_json, timer=None):
+    # Opt-in timing (see pipeline_timing.PipelineTimer)
+    normalize = timer.wrap(normalize_value, "normalize_slot") if timer else normalize_value
+    intent = None
+    slots = parsed_json["slots"]
+
+    if parsed_json["intents"]:
+        intent = parsed_json["intents"][0]
+    else:
+        # Fallback: If no intent, but we have slots, guess 'fly'
+        if "distance" in slots and "direction" in slots:
+            intent = "fly"
+
+    if not intent:
+        return {"command": "REJECT", "reason": "No intent recognized."}
+
+    final_command = {}
+
+    if intent == "fly":
+        dist = normalize("distance", slots.get("distance"))
+        direction = canonical_direction(slots.get("direction"))
+        if not dist or not direction:
+            return {"command": "REJECT", "reason": "Fly command needs distance AND direction."}
+        final_command = {
+            "command": "MOVE",
+            "direction": direction,
+            "distance_meters": dist
+        }
+
+    elif intent == "hover":
+        dur = normalize("duration", slots.get("duration"))
+        if not dur:
+            return {"command": "REJECT", "reason": "Hover command needs duration."}
+        final_command = {"command": "HOVER", "duration_seconds": dur}
+
+    elif intent == "land":
+        final_command = {"command": "LAND"}
+
+    elif intent == "capture":
+        count = normalize("count", slots.get("count"))
+        if not count:
+            # Bug fix: check distance slot if count is missing
+            count = normalize("count", slots.get("distance"))
+        if not count:
+            count = 1
+        final_command = {"command": "CAPTURE_IMAGE", "count": int(count)}
+
+    elif intent == "scan":
+        final_command = {"command": "SCAN_AREA"}
+
+    elif intent == "return":
+        # Special move command to go home
+        final_command = {"command": "MOVE", "direction": "home", "distance_meters": 0}
+
+    elif intent == "takeoff":
+        final_command = {"command": "TAKEOFF"}
+
+    else:
+        final_command = {"command": intent.upper()}
+
+    return final_command
+
+# --- 3. Doc -> JSON ---
+def doc_to_json(doc, threshold=0.5):
+    """Turns a processed spaCy Doc into the {command, intents, slots} JSON."""
+    spacy_intents = {k: v for k, v in doc.cats.items() if v > threshold}
+    spacy_slots = {ent.label_.lower(): ent.text for ent in doc.ents}
+
+    return {
+        "command": doc.text,
+        "intents": list(spacy_intents.keys()),
+        "slots": spacy_slots
+    }
+
+# --- 4. Conditional NER ---
+# Only these intents read slots in generate_command
+SLOT_INTENTS = {"fly", "hover", "capture"}
+
+# Intent scores in this band count as "not sure", so we still run NER
+LOW_CONFIDENCE = (0.2, 0.8)
+
+def needs_slots(doc, threshold=0.5):
+    intents = [k for k, v in doc.cats.items() if v > threshold]
+    if not intents:
+        # generate_command falls back to 'fly' when it sees distance + direction
+        return True
+    # Any of them may be the one that reads slots (compound commands)
+    if any(intent in SLOT_INTENTS for intent in intents):
+        return True
+    return any(LOW_CONFIDENCE[0] < v < LOW_CONFIDENCE[1] for v in doc.cats.values())
+
+def pipe_conditional(nlp, texts, batch_size=DEFAULT_BATCH_SIZE, timer=None, stats=None):
+    """
+    Like nlp.pipe, but runs textcat_multilabel before ner and only sends
+    docs whose intent needs slots (or whose intent is uncertain) through
+    ner. land / takeoff / scan / return / start / stop skip it.
+    ner reads the tok2vec output stored on each doc, so it can run on
+    any subset of the batch. Pass a dict as `stats` to count the skips.
+    """
+    if "ner" not in nlp.pipe_names:
+        yield from nlp.pipe(texts, batch_size=batch_size)
+        return
+    ner = nlp.get_pipe("ner")
+    others = [(name, proc) for name, proc in nlp.pipeline if name != "ner"]
+
+    texts = list(texts)
+    for start in range(0, len(texts), batch_size):
+        begin = time.perf_counter()
+        docs = [nlp.make_doc(text) for text in texts[start:start + batch_size]]
+        if timer is not None:
+            timer.record("tokenizer", (time.perf_counter() - begin) / len(docs), len(docs))
+
+        for name, proc in others:
+            begin = time.perf_counter()
+            docs = list(proc.pipe(docs, batch_size=batch_size))
+            if timer is not None:
+                timer.record(name, (time.perf_counter() - begin) / len(docs), len(docs))
+
+        need = [doc for doc in docs if needs_slots(doc)]
+        if need:
+            begin = time.perf_counter()
+            for _ in ner.pipe(need, batch_size=batch_size):
+                pass
+            if timer is not None:
+                timer.record("ner", (time.perf_counter() - begin) / len(need), len(need))
+
+        if stats is not None:
+            stats["docs"] = stats.get("docs", 0) + len(docs)
+            stats["ner_skipped"] = stats.get("ner_skipped", 0) + len(docs) - len(need)
+        yield from docs
+
+def parse_command(nlp, user_command, rules=None, cache=None, timer=None, conditional_ner=False):
+    """Runs one command through the model and the command generator."""
+    return parse_commands(nlp, [user_command], batch_size=1, rules=rules, cache=cache, timer=timer,
+                          conditional_ner=conditional_ner)[0]
+
+def parse_commands(nlp, commands, batch_size=DEFAULT_BATCH_SIZE, rules=None, cache=None, timer=None, pool=None,
+                   conditional_ner=False, ner_stats=None):
+    """
+    Batched version of parse_command. All commands go through nlp.pipe
+    together, which is much faster than calling nlp() once per string.
+    If a parse_cache.ParseCache is given, repeated commands are answered
+    from it. If a rule_parser.RuleParser is given, commands it can handle
+    on its own skip the model. A pipeline_timing.PipelineTimer collects
+    per-stage latencies. With a worker_pool.ParserPool the model runs in
+    its worker processes instead of here (the timer then only sees
+    generate_command). conditional_ner=True skips ner for intents that
+    don't use slots (see pipe_conditional); pass a dict as ner_stats to
+    count the skips among the commands the model saw (not with a pool).
+    Results come back in the same order as the input.
+    """
+    results = [None] * len(commands)
+    todo = list(range(len(commands)))
+
+    if cache is not None:
+        todo = []
+        for i, command in enumerate(commands):
+            cached = cache.get(command)
+            if cached is None:
+                todo.append(i)
+            else:
+                cached["source"] = "cache"
+                results[i] = cached
+
+    fresh = parse_uncached(nlp, [commands[i] for i in todo], batch_size, rules, timer, pool, conditional_ner,
+                           ner_stats)
+    for i, result in zip(todo, fresh):
+        results[i] = result
+    if cache is not None and todo:
+        cache.put_many([commands[i] for i in todo], fresh)
+    return results
+
+def parse_uncached(nlp, commands, batch_size=DEFAULT_BATCH_SIZE, rules=None, timer=None, pool=None,
+                   conditional_ner=False, ner_stats=None):
+    if rules is not None:
+        parsed, misses = rules.split(commands)
+        sources = ["rules"] * len(commands)
+    else:
+        parsed, misses = [None] * len(commands), list(range(len(commands)))
+        sources = ["model"] * len(commands)
+
+    if misses:
+        start = time.perf_counter()
+        texts = [commands[i] for i in misses]
+        if pool is not None:
+            model_json = pool.map_json(texts)
+        elif conditional_ner:
+            model_json = map(doc_to_json, pipe_conditional(nlp, texts, batch_size, timer, ner_stats))
+        elif timer is not None:
+            model_json = map(doc_to_json, timer.pipe(nlp, texts, batch_size=batch_size))
+        else:
+            model_json = map(doc_to_json, nlp.pipe(texts, batch_size=batch_size))
+        for i, spacy_output_json in zip(misses, model_json):
+            parsed[i] = spacy_output_json
+            sources[i] = "model"
+        if rules is not None:
+            rules.stats.record_model(len(misses), time.perf_counter() - start)
+
+    generate = timer.wrap(generate_command, "generate_command") if timer else generate_command
+    results = []
+    for spacy_output_json, source in zip(parsed, sources):
+        results.append({
+            "parsed": spacy_output_json,
+            "final_command": generate(spacy_output_json, timer=timer),
+            "source": source
+        })
+    return results
@@ -0,0 +1,230 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from collections import Counter, defaultdict
+
+from drone_parser import DEFAULT_BATCH_SIZE, find_model_path, generate_command, parse_commands
+from parse_cache import model_version
+from rule_parser import RuleParser
+from slot_normalizer import canonical_direction, normalize_value
+from spacy_training_data_1000 import INTENT_REGEX, INTENTS_FOR_KEYWORD
+
+SLOTS = ["direction", "distance", "duration", "count"]
+NONE = "-"   # how the generator writes an empty column
+
+
+# --- 1. Streaming the Gold Rows ---
+def read_rows(path):
+    """Yields gold rows (dicts with the generator's columns) from .csv, .jsonl or .parquet."""
+    if path.endswith(".jsonl"):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet input needs pyarrow (pip install pyarrow).")
+        for batch in pq.ParquetFile(path).iter_batches():
+            yield from batch.to_pylist()
+    else:
+        with open(path, newline="") as f:
+            yield from csv.DictReader(f)
+
+def read_inputs(inputs):
+    """Files, or directories of generator shards, one after another."""
+    for path in inputs:
+        if os.path.isdir(path):
+            for shard in sorted(glob.glob(os.path.join(path, "commands-*.*"))):
+                yield from read_rows(shard)
+        else:
+            yield from read_rows(path)
+
+def read_chunks(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# --- 2. Gold -> Expected Output ---
+def gold_value(row, column):
+    value = (row.get(column) or NONE).strip()
+    return None if value == NONE else value
+
+def mentioned_intents(command):
+    """Intents whose keywords appear in command (the same ones the training data labels)."""
+    intents = set()
+    for match in INTENT_REGEX.finditer(command.lower()):
+        intents |= INTENTS_FOR_KEYWORD[match.group(1)]
+    return intents
+
+def gold_intents(row):
+    intents = [gold_value(row, "intent")]
+    # The task column is also filled in for single commands ("start mission"
+    # has task "record"), so it only counts when the command actually says it
+    task = gold_value(row, "task")
+    if task and task in mentioned_intents(row["command"]):
+        intents.append(task)
+    return [intent for i, intent in enumerate(intents) if intent and intent not in intents[:i]]
+
+def gold_json(row):
+    """The {command, intents, slots} a perfect model would produce for this row."""
+    slots = {slot: gold_value(row, slot) for slot in SLOTS if gold_value(row, slot)}
+    return {"command": row["command"], "intents": gold_intents(row), "slots": slots}
+
+def slot_key(slot, value):
+    """What must match: the direction, or the value in canonical units ('1.5km' == '1500m')."""
+    if value is None:
+        return None
+    if slot == "direction":
+        return canonical_direction(value)
+    return normalize_value(slot, value)
+
+def command_key(command):
+    return json.dumps(command, sort_keys=True)
+
+
+# --- 3. Incremental Scoring ---
+class Evaluation:
+    """
+    Running counts only (no per-row storage), so memory doesn't grow with
+    the number of rows.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.intent_correct = Counter()   # per gold intent: predicted top intent was right
+        self.intent_total = Counter()
+        self.task_correct = 0             # rows that name a second intent: it was found
+        self.task_total = 0
+        self.slot_correct = Counter()     # per slot: gold and prediction both have it and agree
+        self.slot_total = Counter()       # rows where gold or prediction has the slot
+        self.slot_gold = Counter()
+        self.slot_predicted = Counter()
+        self.command_correct = 0          # generate_command output matches the gold one
+        self.confusion = defaultdict(Counter)
+        self.sources = Counter()
+
+    def add(self, row, result):
+        gold = gold_json(row)
+        parsed = result["parsed"]
+        self.rows += 1
+        self.sources[result["source"]] += 1
+
+        expected = gold["intents"][0] if gold["intents"] else "none"
+        predicted = parsed["intents"][0] if parsed["intents"] else "none"
+        self.confusion[expected][predicted] += 1
+        self.intent_total[expected] += 1
+        self.intent_correct[expected] += expected == predicted
+
+        if len(gold["intents"]) > 1:
+            self.task_total += 1
+            self.task_correct += gold["intents"][1] in parsed["intents"]
+
+        for slot in SLOTS:
+            expected, predicted = gold["slots"].get(slot), parsed["slots"].get(slot)
+            if expected is None and predicted is None:
+                continue
+            self.slot_total[slot] += 1
+            self.slot_gold[slot] += expected is not None
+            self.slot_predicted[slot] += predicted is not None
+            self.slot_correct[slot] += expected is not None and predicted is not None and \
+                slot_key(slot, expected) == slot_key(slot, predicted)
+
+        self.command_correct += command_key(generate_command(gold)) == command_key(result["final_command"])
+
+    def report(self):
+        def ratio(a, b):
+            return a / b if b else 0.0
+
+        return {
+            "rows": self.rows,
+            "intent_accuracy": ratio(sum(self.intent_correct.values()), self.rows),
+            "per_intent_accuracy": {k: ratio(self.intent_correct[k], n) for k, n in sorted(self.intent_total.items())},
+            "compound_task_recall": ratio(self.task_correct, self.task_total),
+            "per_slot_accuracy": {k: ratio(self.slot_correct[k], self.slot_total[k]) for k in SLOTS},
+            "per_slot_precision": {k: ratio(self.slot_correct[k], self.slot_predicted[k]) for k in SLOTS},
+            "per_slot_recall": {k: ratio(self.slot_correct[k], self.slot_gold[k]) for k in SLOTS},
+            "command_accuracy": ratio(self.command_correct, self.rows),
+            "confusion": {gold: dict(predicted) for gold, predicted in sorted(self.confusion.items())},
+            "sources": dict(self.sources),
+        }
+
+
+def evaluate(nlp, rows, batch_size=DEFAULT_BATCH_SIZE, chunk_size=4096, rules=None):
+    """Streams rows through parse_commands chunk by chunk. Returns (Evaluation, seconds spent parsing)."""
+    evaluation = Evaluation()
+    parse_seconds = 0.0
+    for chunk in read_chunks(rows, chunk_size):
+        start = time.perf_counter()
+        results = parse_commands(nlp, [row["command"] for row in chunk], batch_size=batch_size, rules=rules)
+        parse_seconds += time.perf_counter() - start
+        for row, result in zip(chunk, results):
+            evaluation.add(row, result)
+    return evaluation, parse_seconds
+
+def print_confusion(confusion):
+    labels = sorted(set(confusion) | {p for row in confusion.values() for p in row})
+    width = max(len(label) for label in labels) + 2
+    print(f"{'gold / pred':<{width}}" + "".join(f"{label[:8]:>9}" for label in labels))
+    for gold in labels:
+        row = confusion.get(gold, {})
+        print(f"{gold:<{width}}" + "".join(f"{row.get(label, 0):>9}" for label in labels))
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score the model + generate_command against gold labels")
+    parser.add_argument("--input", nargs="+", default=["drone_commands_1000.csv"],
+                        help="Gold .csv/.jsonl/.parquet files or generator shard directories")
+    parser.add_argument("--model", default=None, help="Model folder (default: model_output_1000/model-best)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--chunk-size", type=int, default=4096, help="Rows read and parsed at a time")
+    parser.add_argument("--fast-path", action="store_true", help="Answer formulaic commands with the rules")
+    parser.add_argument("--output", default="eval_report.json")
+    args = parser.parse_args()
+
+    model_path = args.model or find_model_path()
+    if model_path is None:
+        print("ERROR: Could not find model files.")
+        exit(1)
+    import spacy
+    nlp = spacy.load(model_path)
+
+    start = time.perf_counter()
+    evaluation, parse_seconds = evaluate(nlp, read_inputs(args.input), args.batch_size, args.chunk_size,
+                                         RuleParser() if args.fast_path else None)
+    total_seconds = time.perf_counter() - start
+
+    report = evaluation.report()
+    report["throughput"] = {
+        "total_seconds": total_seconds,
+        "parse_seconds": parse_seconds,
+        "commands_per_sec": report["rows"] / parse_seconds if parse_seconds else 0.0,
+    }
+    report["meta"] = {"model_path": model_path, "model_version": model_version(model_path),
+                      "inputs": args.input, "fast_path": args.fast_path}
+
+    print(f"Rows: {report['rows']}  ({report['throughput']['commands_per_sec']:.0f} cmd/s)")
+    print(f"Intent accuracy: {report['intent_accuracy']:.3f}  Command accuracy: {report['command_accuracy']:.3f}  "
+          f"Compound task recall: {report['compound_task_recall']:.3f}")
+    for intent, acc in report["per_intent_accuracy"].items():
+        print(f"  {intent:<10}{acc:.3f}")
+    print(f"  {'slot':<10}{'acc':>7}{'prec':>7}{'recall':>7}")
+    for slot, acc in report["per_slot_accuracy"].items():
+        print(f"  {slot.upper():<10}{acc:>7.3f}{report['per_slot_precision'][slot]:>7.3f}"
+              f"{report['per_slot_recall'][slot]:>7.3f}")
+    print_confusion(report["confusion"])
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved evaluation to {args.output}")
@@ -0,0 +1,106 @@
+import argparse
+import time
+
+import numpy as np
+
+from slot_normalizer import DIRECTION_NAMES, DIRECTION_TABLE, UNIT_SCALES, direction_indices
+
+# Axes are x = east, y = north, z = altitude (all in meters). The
+# direction and unit tables live in slot_normalizer, shared with the parser.
+
+
+# --- 1. The Fleet ---
+class FleetState:
+    """
+    Positions of every drone in one (n_drones, 3) array.
+
+    Moves are applied in batches: the directions become rows of
+    DIRECTION_TABLE, get scaled by the distances and are added in one
+    NumPy step, however many drones the batch touches.
+
+        fleet = FleetState(1000)
+        fleet.apply_moves([0, 1], ["north", "ne"], [50, 20], ["m", "ft"])
+    """
+
+    def __init__(self, n_drones, home=(0.0, 0.0, 0.0)):
+        self.home = np.asarray(home, dtype=float)
+        self.positions = np.tile(self.home, (n_drones, 1))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def apply_moves(self, drone_ids, directions, distances, units=None):
+        """
+        drone_ids, directions (strings or DIRECTION_TABLE rows) and distances
+        are equal-length sequences. units (e.g. 'ft', 'km') scale the
+        distances to meters; leave it out when they are meters already.
+        A drone may appear several times; all of its moves are added.
+        """
+        drone_ids = np.asarray(drone_ids, dtype=np.intp)
+        directions = np.asarray(directions)
+        if directions.dtype.kind in "US":
+            directions = direction_indices(directions)
+        meters = np.asarray(distances, dtype=float)
+        if units is not None:
+            scales = UNIT_SCALES["distance"]
+            meters = meters * np.fromiter((scales.get(u, 1.0) for u in units), dtype=float, count=len(meters))
+
+        np.add.at(self.positions, drone_ids, DIRECTION_TABLE[directions] * meters[:, None])
+        # Drones can't fly below the ground
+        np.maximum(self.positions[:, 2], 0.0, out=self.positions[:, 2])
+
+    def return_home(self, drone_ids):
+        self.positions[np.asarray(drone_ids, dtype=np.intp)] = self.home
+
+    def apply_commands(self, drone_ids, commands):
+        """
+        Applies generate_command outputs (distance_meters is already in
+        meters). MOVE home sends a drone back to base; every other non-MOVE
+        command leaves positions alone. Returns how many drones moved.
+        """
+        move_ids, directions, distances, home_ids = [], [], [], []
+        for drone_id, command in zip(drone_ids, commands):
+            if command.get("command") != "MOVE":
+                continue
+            if command.get("direction") == "home":
+                home_ids.append(drone_id)
+                continue
+            move_ids.append(drone_id)
+            directions.append(command.get("direction"))
+            distances.append(command.get("distance_meters") or 0.0)
+
+        if home_ids:
+            self.return_home(home_ids)
+        if move_ids:
+            self.apply_moves(move_ids, direction_indices(directions), distances)
+        return len(move_ids) + len(home_ids)
+
+
+# --- 2. Benchmark ---
+def benchmark_step(n_drones, n_moves, steps, seed=0):
+    """Average seconds per apply_moves call with n_moves random moves."""
+    rng = np.random.default_rng(seed)
+    fleet = FleetState(n_drones)
+    ids = rng.integers(0, n_drones, size=(steps, n_moves))
+    directions = rng.integers(1, len(DIRECTION_NAMES), size=(steps, n_moves))
+    distances = rng.uniform(1, 500, size=(steps, n_moves))
+
+    start = time.perf_counter()
+    for step in range(steps):
+        fleet.apply_moves(ids[step], directions[step], distances[step])
+    return (time.perf_counter() - start) / steps
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark vectorised fleet moves")
+    parser.add_argument("--drones", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--moves", type=int, default=None, help="Moves per step (default: one per drone)")
+    parser.add_argument("--steps", type=int, default=200)
+    args = parser.parse_args()
+
+    for n_drones in args.drones:
+        n_moves = args.moves or n_drones
+        seconds = benchmark_step(n_drones, n_moves, args.steps)
+        print(f"{n_drones:>8} drones, {n_moves:>8} moves/step: {1e6 * seconds:>10.1f} us/step "
+              f"({n_moves / seconds:,.0f} moves/s)")
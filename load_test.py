@@ -0,0 +1,365 @@
+import argparse
+import collections
+import gc
+import json
+import os
+import random
+import resource
+import sys
+import time
+import urllib.request
+
+import data_generator_1000 as generator
+from drone_parser import DEFAULT_BATCH_SIZE, find_model_path, load_model, parse_commands
+from parse_cache import ParseCache, model_version
+from pipeline_timing import LatencyHistogram
+from rule_parser import RuleParser
+
+# Everything but make_compound is a one-step command
+SIMPLE_BUILDERS = [b for b in generator.ROW_BUILDERS if b is not generator.make_compound]
+SIMPLE_WEIGHTS = [w for b, w in zip(generator.ROW_BUILDERS, generator.ROW_WEIGHTS) if b is not generator.make_compound]
+
+
+# --- 1. Traffic ---
+class TrafficGenerator:
+    """
+    Commands from the generator templates with a chosen mix:
+    compound_ratio of them are compound ("fly 50m north and take 3 photos"),
+    and repeat_rate of them repeat one of the last `recent` commands
+    (what a cache sees when pilots resend the same thing).
+    """
+
+    def __init__(self, compound_ratio=0.2, repeat_rate=0.3, seed=0, recent=1000):
+        self.compound_ratio = compound_ratio
+        self.repeat_rate = repeat_rate
+        self.rng = random.Random(seed)
+        self.recent = collections.deque(maxlen=recent)
+
+    def next_command(self):
+        if self.recent and self.rng.random() < self.repeat_rate:
+            return self.rng.choice(self.recent)
+        if self.rng.random() < self.compound_ratio:
+            command = generator.make_compound(self.rng)[0]
+        else:
+            command = self.rng.choices(SIMPLE_BUILDERS, weights=SIMPLE_WEIGHTS)[0](self.rng)[0]
+        self.recent.append(command)
+        return command
+
+    def batch(self, n):
+        return [self.next_command() for _ in range(n)]
+
+def offered_rate(elapsed, rate, burst_every=0.0, burst_seconds=0.0, burst_factor=1.0):
+    """Commands/sec wanted at this point of the run: rate, times burst_factor during a burst."""
+    if burst_every and elapsed % burst_every < burst_seconds:
+        return rate * burst_factor
+    return rate
+
+
+# --- 2. Targets ---
+class InProcessTarget:
+    """
+    Calls drone_parser.parse_commands directly. With simulate=True every
+    executed MOVE also updates a FleetState and the map is re-rendered
+    every render_every batches, so leaks in those show up as well.
+    """
+
+    def __init__(self, nlp, rules=None, cache=None, batch_size=DEFAULT_BATCH_SIZE, simulate=False,
+                 n_drones=100, render_every=10):
+        self.nlp = nlp
+        self.rules = rules
+        self.cache = cache
+        self.batch_size = batch_size
+        self.fleet = None
+        self.renderer = None
+        self.render_every = render_every
+        self.batches = 0
+        if simulate:
+            from fleet_state import FleetState
+            from map_renderer import MapRenderer
+            self.fleet = FleetState(n_drones)
+            self.renderer = MapRenderer(n_drones)
+
+    def send(self, commands):
+        results = parse_commands(self.nlp, commands, batch_size=self.batch_size, rules=self.rules, cache=self.cache)
+        if self.fleet is not None:
+            drone_ids = [(self.batches + i) % len(self.fleet) for i in range(len(results))]
+            self.fleet.apply_commands(drone_ids, [r["final_command"] for r in results])
+            self.renderer.record(self.fleet.positions)
+            if self.batches % self.render_every == 0:
+                self.renderer.render()
+        self.batches += 1
+
+    def sample(self):
+        """Memory and leak counters of this process, which is where the parsing happens."""
+        return {"rss_mb": current_rss_mb(), "gc_objects": len(gc.get_objects()), "open_figures": open_figures()}
+
+class HttpTarget:
+    """
+    POSTs each batch to a running parse_server.py. Memory is sampled from
+    the server's /stats (its own RSS plus its workers'), since this
+    process only generates the load.
+    """
+
+    def __init__(self, url, timeout=30.0):
+        self.url = url.rstrip("/") + "/parse"
+        self.stats_url = url.rstrip("/") + "/stats"
+        self.timeout = timeout
+
+    def send(self, commands):
+        body = json.dumps({"commands": commands}).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def sample(self):
+        sample = {"rss_mb": None, "gc_objects": None, "open_figures": None,
+                  "client_rss_mb": current_rss_mb()}   # the load generator, kept out of the verdict
+        try:
+            with urllib.request.urlopen(self.stats_url, timeout=self.timeout) as response:
+                process = json.loads(response.read()).get("process")
+        except (OSError, ValueError):
+            return sample
+        if process and process.get("rss_mb") is not None:
+            workers = [mb for mb in process.get("worker_rss_mb", []) if mb is not None]
+            sample.update(rss_mb=process["rss_mb"] + sum(workers), server_rss_mb=process["rss_mb"],
+                          worker_rss_mb=sum(workers), gc_objects=process.get("gc_objects"))
+        return sample
+
+
+# --- 3. Measurements ---
+def current_rss_mb():
+    """Resident memory right now (Linux), or the peak where that isn't available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+def open_figures():
+    """pyplot figures still open (the old app leaked one per rerun)."""
+    if "matplotlib.pyplot" not in sys.modules:
+        return 0
+    return len(sys.modules["matplotlib.pyplot"].get_fignums())
+
+def memory_slope(windows):
+    """RSS growth in MB/hour from a least-squares fit (the first window is warm-up)."""
+    points = [(w["elapsed_s"], w["rss_mb"]) for w in windows[1:] if w["rss_mb"] is not None]
+    if len(points) < 2:
+        return 0.0
+    mean_t = sum(t for t, _ in points) / len(points)
+    mean_m = sum(m for _, m in points) / len(points)
+    var = sum((t - mean_t) ** 2 for t, _ in points)
+    if not var:
+        return 0.0
+    return 3600 * sum((t - mean_t) * (m - mean_m) for t, m in points) / var
+
+
+# --- 4. Driving the Load ---
+def run_load(target, traffic, duration, rate, burst_every=0.0, burst_seconds=0.0, burst_factor=1.0,
+             max_batch=256, max_backlog=100000, window_seconds=10.0, tick=0.05, cache=None, log=None):
+    """
+    Open-loop load: commands are scheduled at the offered rate whether or
+    not the target keeps up. Latency is measured from when a command was
+    scheduled, so time spent waiting behind a slow target counts. If the
+    backlog passes max_backlog the oldest commands are dropped (and
+    counted) to keep memory bounded on long soaks.
+
+    Returns one summary dict per window; each is also passed to log().
+    """
+    windows = []
+    overall = LatencyHistogram()
+    pending = collections.deque()   # [scheduled_time, n_commands]
+    backlog = 0
+    owed = 0.0
+
+    def close_window(now):
+        span = now - window_start
+        hist = window["hist"]
+        summary = {
+            "elapsed_s": round(now - start, 3),
+            "offered_per_sec": window["offered"] / span,
+            "throughput_per_sec": window["sent"] / span,
+            "p50_ms": 1000 * hist.quantile(0.5),
+            "p95_ms": 1000 * hist.quantile(0.95),
+            "p99_ms": 1000 * hist.quantile(0.99),
+            "backlog": backlog,
+            "dropped": window["dropped"],
+            "errors": window["errors"],
+        }
+        # Measured where the parsing runs (the server for an HttpTarget)
+        summary.update(target.sample())
+        if cache is not None:
+            summary["cache"] = cache.stats()
+        windows.append(summary)
+        if log is not None:
+            log(summary)
+
+    start = last_tick = window_start = time.perf_counter()
+    window = {"hist": LatencyHistogram(), "offered": 0, "sent": 0, "dropped": 0, "errors": 0}
+    while True:
+        now = time.perf_counter()
+        elapsed = now - start
+        if elapsed >= duration:
+            break
+
+        # Schedule what is due since the last tick
+        owed += offered_rate(elapsed, rate, burst_every, burst_seconds, burst_factor) * (now - last_tick)
+        last_tick = now
+        due = int(owed)
+        if due:
+            owed -= due
+            pending.append([now, due])
+            backlog += due
+            window["offered"] += due
+        while backlog > max_backlog:
+            drop = min(pending[0][1], backlog - max_backlog)
+            pending[0][1] -= drop
+            backlog -= drop
+            window["dropped"] += drop
+            if not pending[0][1]:
+                pending.popleft()
+
+        # Send one batch of the oldest pending commands
+        if backlog:
+            taken, take = [], min(max_batch, backlog)
+            while take:
+                scheduled, n = pending[0]
+                k = min(n, take)
+                taken.append((scheduled, k))
+                take -= k
+                if k == n:
+                    pending.popleft()
+                else:
+                    pending[0][1] -= k
+            n_sent = sum(k for _, k in taken)
+            backlog -= n_sent
+            try:
+                target.send(traffic.batch(n_sent))
+            except Exception:
+                window["errors"] += n_sent
+            else:
+                done = time.perf_counter()
+                for scheduled, k in taken:
+                    window["hist"].add(done - scheduled, k)
+                    overall.add(done - scheduled, k)
+                window["sent"] += n_sent
+        else:
+            time.sleep(tick)
+
+        # Close the window
+        now = time.perf_counter()
+        if now - window_start >= window_seconds:
+            close_window(now)
+            window = {"hist": LatencyHistogram(), "offered": 0, "sent": 0, "dropped": 0, "errors": 0}
+            window_start = now
+
+    # Whatever is left of the last window
+    now = time.perf_counter()
+    if window["offered"] and now > window_start:
+        close_window(now)
+    return windows, overall
+
+def find_saturation(target, traffic, start_rate, factor, step_seconds, max_steps, slo_p99_ms, **kwargs):
+    """
+    Steps the offered rate up by `factor` until the target falls behind
+    (throughput < 90% of offered) or p99 passes the SLO. Returns the
+    per-step results and the last rate that was still fine.
+    """
+    steps, sustained = [], None
+    rate = start_rate
+    for _ in range(max_steps):
+        windows, hist = run_load(target, traffic, step_seconds, rate, window_seconds=step_seconds, **kwargs)
+        window = windows[-1] if windows else {"throughput_per_sec": 0.0, "offered_per_sec": rate}
+        step = {"rate": rate, "throughput_per_sec": window["throughput_per_sec"],
+                "p99_ms": 1000 * hist.quantile(0.99)}
+        steps.append(step)
+        print(f"  rate {rate:>8.0f}/s -> {step['throughput_per_sec']:>8.0f}/s  p99={step['p99_ms']:.1f}ms")
+        if step["throughput_per_sec"] < 0.9 * window["offered_per_sec"] or step["p99_ms"] > slo_p99_ms:
+            break
+        sustained = rate
+        rate *= factor
+    return steps, sustained
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load / soak test the parsing path with synthetic traffic")
+    parser.add_argument("--url", default=None, help="Test a running parse_server.py instead of parsing in-process")
+    parser.add_argument("--rate", type=float, default=200.0, help="Offered commands/sec")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds to run (e.g. 14400 for a 4h soak)")
+    parser.add_argument("--compound-ratio", type=float, default=0.2)
+    parser.add_argument("--repeat-rate", type=float, default=0.3)
+    parser.add_argument("--burst-every", type=float, default=0.0, help="Seconds between bursts (0 = no bursts)")
+    parser.add_argument("--burst-seconds", type=float, default=5.0)
+    parser.add_argument("--burst-factor", type=float, default=5.0)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--max-batch", type=int, default=256, help="Most commands sent in one call")
+    parser.add_argument("--window", type=float, default=10.0, help="Seconds per report window")
+    parser.add_argument("--no-fast-path", action="store_true")
+    parser.add_argument("--cache-size", type=int, default=0, help="In-process parse cache entries (0 = off)")
+    parser.add_argument("--simulate", action="store_true", help="Also drive a FleetState and the map renderer")
+    parser.add_argument("--find-saturation", action="store_true",
+                        help="Ramp the rate up from --rate until throughput or p99 gives out")
+    parser.add_argument("--ramp-factor", type=float, default=1.5)
+    parser.add_argument("--ramp-step", type=float, default=10.0, help="Seconds per ramp step")
+    parser.add_argument("--slo-p99-ms", type=float, default=250.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log", default="load_windows.jsonl", help="Per-window results, appended as they happen")
+    parser.add_argument("--output", default="load_report.json")
+    args = parser.parse_args()
+
+    cache = None
+    meta = {"target": args.url or "in-process",
+            "memory_measured_in": "server /stats" if args.url else "this process"}
+    if args.url:
+        target = HttpTarget(args.url)
+    else:
+        nlp = load_model()
+        if nlp is None:
+            print("ERROR: Could not find model files.")
+            exit(1)
+        model_path = find_model_path()
+        meta["model_version"] = model_version(model_path)
+        if args.cache_size:
+            cache = ParseCache(meta["model_version"], capacity=args.cache_size)
+        target = InProcessTarget(nlp, None if args.no_fast_path else RuleParser(), cache, args.batch_size,
+                                 simulate=args.simulate)
+
+    traffic = TrafficGenerator(args.compound_ratio, args.repeat_rate, args.seed)
+    settings = {k: v for k, v in vars(args).items() if k not in ("log", "output")}
+
+    if args.find_saturation:
+        print("Looking for the saturation point...")
+        steps, sustained = find_saturation(target, traffic, args.rate, args.ramp_factor, args.ramp_step, 20,
+                                           args.slo_p99_ms, max_batch=args.max_batch)
+        report = {"meta": meta, "settings": settings, "ramp": steps, "max_sustained_rate": sustained}
+        print(f"Highest rate sustained: {sustained if sustained is not None else 'none'} commands/sec")
+    else:
+        log_file = open(args.log, "a")
+
+        def log(summary):
+            log_file.write(json.dumps(summary) + "\n")
+            log_file.flush()
+            print(f"[{summary['elapsed_s']:>8.0f}s] offered {summary['offered_per_sec']:>7.0f}/s  "
+                  f"done {summary['throughput_per_sec']:>7.0f}/s  p99 {summary['p99_ms']:>8.1f}ms  "
+                  f"backlog {summary['backlog']:>6}  rss {summary['rss_mb'] or 0:.0f}MB  figs {summary['open_figures']}")
+
+        windows, overall = run_load(target, traffic, args.duration, args.rate, args.burst_every, args.burst_seconds,
+                                    args.burst_factor, args.max_batch, window_seconds=args.window, cache=cache,
+                                    log=log)
+        log_file.close()
+        report = {
+            "meta": meta,
+            "settings": settings,
+            "latency_ms": {f"p{int(q * 100)}": 1000 * overall.quantile(q) for q in (0.5, 0.95, 0.99)},
+            "commands": overall.count,
+            "rss_growth_mb_per_hour": memory_slope(windows),
+            "windows": windows,
+        }
+        print(f"{overall.count} commands; p99 {report['latency_ms']['p99']:.1f}ms; "
+              f"RSS growth {report['rss_growth_mb_per_hour']:+.1f} MB/hour")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved load report to {args.output}")
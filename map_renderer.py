@@ -0,0 +1,137 @@
+import argparse
+import time
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# --- 1. The Renderer ---
+class MapRenderer:
+    """
+    Draws the drone map without rebuilding the figure.
+
+    The figure, the drone markers and the trail line are made once. The
+    static part (axes, grid, home marker, legend) is rendered to a cached
+    background; each frame restores it and redraws only the two moving
+    artists. The figure is not registered with pyplot, so nothing leaks
+    when the renderer is dropped.
+
+        renderer = MapRenderer()
+        renderer.record(fleet.positions)
+        st.image(renderer.render())
+    """
+
+    def __init__(self, n_drones=1, limit=300, trail_length=200, figsize=(6, 6), dpi=100):
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        self.ax.scatter([0], [0], marker='x', s=100, color='red', label='Home')
+        self.ax.set_xlabel("West <---> East")
+        self.ax.set_ylabel("South <---> North")
+        self.ax.grid(True)
+
+        # Animated artists are left out of canvas.draw(), i.e. the background
+        self.trail_line, = self.ax.plot([], [], '-', linewidth=1, alpha=0.6, label='Trail', animated=True)
+        self.drones = self.ax.scatter([], [], marker='o', label='Drone', zorder=10, animated=True)
+        self.ax.legend(loc='upper right')
+
+        self.trail_length = trail_length
+        self.reset(n_drones)
+        self.set_limit(limit)
+
+    def reset(self, n_drones):
+        """Forget the trail (and size it for n_drones)."""
+        self.n_drones = n_drones
+        self.trail = np.full((self.trail_length, n_drones, 2), np.nan)
+        self.trail_next = 0
+        self.positions = np.zeros((n_drones, 2))
+        # Big markers for a few drones, small ones for a swarm
+        self.drones.set_sizes([200 if n_drones <= 10 else 20])
+
+    def set_limit(self, limit):
+        self.limit = limit
+        self.ax.set_xlim(-limit, limit)
+        self.ax.set_ylim(-limit, limit)
+        self.background = None
+
+    def record(self, positions):
+        """Adds the current (n_drones, 2 or 3) positions to the trail."""
+        positions = np.asarray(positions, dtype=float)[:, :2]
+        if len(positions) != self.n_drones:
+            self.reset(len(positions))
+        self.positions = positions.copy()
+        self.trail[self.trail_next % self.trail_length] = self.positions
+        self.trail_next += 1
+
+    def trail_xy(self):
+        """All trails as one line: oldest to newest per drone, NaN between drones."""
+        start = self.trail_next % self.trail_length
+        ordered = np.roll(self.trail, -start, axis=0).transpose(1, 0, 2)
+        gaps = np.full((self.n_drones, 1, 2), np.nan)
+        return np.concatenate([ordered, gaps], axis=1).reshape(-1, 2)
+
+    def render(self):
+        """Draws a frame and returns it as an RGBA array (for st.image)."""
+        # Grow the view (and redraw the background) when a drone leaves it
+        furthest = np.abs(self.positions).max(initial=0.0)
+        if furthest > self.limit:
+            limit = self.limit
+            while limit < furthest:
+                limit *= 2
+            self.set_limit(limit)
+
+        if self.background is None:
+            self.canvas.draw()
+            self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.canvas.restore_region(self.background)
+
+        xy = self.trail_xy()
+        self.trail_line.set_data(xy[:, 0], xy[:, 1])
+        self.drones.set_offsets(self.positions)
+        self.ax.draw_artist(self.trail_line)
+        self.ax.draw_artist(self.drones)
+        self.canvas.blit(self.fig.bbox)
+        return np.asarray(self.canvas.buffer_rgba()).copy()
+
+
+# --- 2. Benchmark ---
+def full_redraw(positions):
+    """What app.py used to do on every rerun: a new pyplot figure each time."""
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots()
+    ax.scatter(positions[:, 0], positions[:, 1], marker='o', s=200, label='Drone', zorder=10)
+    ax.scatter([0], [0], marker='x', s=100, color='red', label='Home')
+    ax.set_xlim(-300, 300)
+    ax.set_ylim(-300, 300)
+    ax.grid(True)
+    ax.legend()
+    fig.canvas.draw()
+    plt.close(fig)
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare incremental map frames with full redraws")
+    parser.add_argument("--drones", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--frames", type=int, default=50)
+    args = parser.parse_args()
+
+    import matplotlib
+    matplotlib.use("Agg")
+    rng = np.random.default_rng(0)
+    for n_drones in args.drones:
+        walk = np.cumsum(rng.normal(0, 5, size=(args.frames, n_drones, 2)), axis=0)
+
+        renderer = MapRenderer(n_drones)
+        start = time.perf_counter()
+        for frame in walk:
+            renderer.record(frame)
+            renderer.render()
+        incremental = (time.perf_counter() - start) / args.frames
+
+        start = time.perf_counter()
+        for frame in walk:
+            full_redraw(frame)
+        full = (time.perf_counter() - start) / args.frames
+
+        print(f"{n_drones:>6} drones: incremental {1000 * incremental:.1f} ms/frame, "
+              f"full redraw {1000 * full:.1f} ms/frame")
@@ -0,0 +1,178 @@
+import argparse
+import itertools
+import json
+import re
+
+from drone_parser import DEFAULT_BATCH_SIZE, generate_command, load_model, parse_commands
+from rule_parser import INTENT_RES, RuleParser
+
+# --- 1. Splitting a Mission Into Steps ---
+# "fly 50m north and take 3 photos", "scan for 10s, then return to base".
+# Sentence ends and semicolons split too, so a paragraph works as well as
+# one command per line.
+STEP_SPLIT_RE = re.compile(r"\s*(?:[.;]\s+|[.;]$|,?\s*\b(?:and then|then|and)\b\s*)\s*", re.I)
+
+# "take off" would otherwise read as the capture keyword "take"
+TAKE_OFF_RE = re.compile(r"\btake\s+off\b", re.I)
+
+# Fly verbs that say which way to go on their own ("climb 20m")
+IMPLIED_DIRECTIONS = {"climb": "up", "ascend": "up", "descend": "down", "lower": "down"}
+
+def split_steps(line):
+    """Splits one line of a mission script into its ordered clauses."""
+    line = TAKE_OFF_RE.sub("takeoff", line)
+    return [part.strip() for part in STEP_SPLIT_RE.split(line) if part and part.strip()]
+
+def read_mission(lines):
+    """
+    Yields (line_number, clause) for every step in the script.
+    Blank lines and lines starting with '#' are skipped.
+    """
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        for clause in split_steps(line):
+            yield line_number, clause
+
+
+# --- 2. Parsed JSON -> Steps ---
+# The intents on a clause are keyword co-occurrence labels ("return to
+# launch" is return + takeoff), not a list of actions. A clause only
+# becomes several steps when each intent has its own action verb in the
+# text (or its keyword plus its own slot, e.g. "3 photos" for capture).
+STEP_VERBS = {
+    "fly": ["fly", "move", "go", "climb", "ascend", "descend", "strafe", "advance", "retreat", "head"],
+    "land": ["land", "touchdown"],
+    "hover": ["hover", "hold position"],
+    "capture": ["take", "capture", "snap"],
+    "record": ["record"],
+    "scan": ["scan", "survey", "inspect"],
+    "return": ["return", "come back", "go home", "rtl"],
+    "takeoff": ["takeoff"],
+}
+STEP_VERB_RES = {
+    intent: re.compile(r"\b(" + "|".join(re.escape(v) for v in sorted(verbs, key=len, reverse=True)) + r")\b")
+    for intent, verbs in STEP_VERBS.items()
+}
+INTENT_SLOTS = {"fly": ["distance", "direction"], "hover": ["duration"], "capture": ["count"]}
+
+# "start recording", "stop the scan": these qualify another action
+MODIFIER_INTENTS = {"start", "stop"}
+
+def keyword_spans(lower, intents):
+    """{intent: (start, end)} of each intent's first keyword, minus spans inside a longer one ("go" in "go home")."""
+    spans = {}
+    for intent in intents:
+        match = INTENT_RES[intent].search(lower) if intent in INTENT_RES else None
+        if match:
+            spans[intent] = match.span()
+    return {
+        intent: (start, end) for intent, (start, end) in spans.items()
+        if not any(o != intent and os <= start and end <= oe and oe - os > end - start
+                   for o, (os, oe) in spans.items())
+    }
+
+def step_positions(parsed, slots):
+    """{intent: text position} for the action intents that have their own evidence in the text."""
+    lower = parsed["command"].lower()
+    actions = [intent for intent in parsed["intents"] if intent not in MODIFIER_INTENTS]
+    spans = keyword_spans(lower, actions)
+    positions = {}
+    for intent in actions:
+        if intent not in spans:
+            continue
+        verb = STEP_VERB_RES[intent].search(lower) if intent in STEP_VERB_RES else None
+        if verb and spans[intent][0] == verb.start():
+            positions[intent] = verb.start()
+        elif any(slot in slots for slot in INTENT_SLOTS.get(intent, [])):
+            positions[intent] = spans[intent][0]
+    return positions
+
+def clause_steps(parsed):
+    """
+    One command per clause, from generate_command (the same path as
+    drone_parser), unless every action in the clause has its own evidence
+    ("takeoff, go 20m north"); those become one command each, in text order.
+    A single step leads with the intent the text backs up, so "go home"
+    is a return and "initiate takeoff" a takeoff.
+    """
+    slots = dict(parsed["slots"])
+    if "direction" not in slots:
+        for word in parsed["command"].lower().split():
+            if word in IMPLIED_DIRECTIONS:
+                slots["direction"] = IMPLIED_DIRECTIONS[word]
+                break
+
+    intents = parsed["intents"]
+    positions = step_positions(parsed, slots) if len(intents) > 1 else {}
+    actions = [intent for intent in intents if intent not in MODIFIER_INTENTS]
+    if len(positions) > 1 and len(positions) == len(actions):
+        ordered = sorted(positions, key=positions.get)
+        return [generate_command(dict(parsed, intents=[intent], slots=slots)) for intent in ordered]
+    leading = [intent for intent in intents if intent in positions]
+    return [generate_command(dict(parsed, intents=leading + [i for i in intents if i not in leading], slots=slots))]
+
+
+# --- 3. The Compiler ---
+def compile_mission(nlp, lines, batch_size=DEFAULT_BATCH_SIZE, rules=None, cache=None, pool=None,
+                    conditional_ner=False, chunk_size=4096):
+    """
+    Compiles a mission script (any iterable of lines) into an ordered plan.
+    Lines are read as a stream and their clauses parsed chunk_size at a
+    time, each chunk in one batched parse_commands call.
+
+    Returns {"steps": [...], "errors": [...]}. Each step is a command from
+    generate_command plus the line and clause it came from; rejected
+    clauses are listed in errors instead.
+    """
+    plan = {"steps": [], "errors": []}
+    clauses = read_mission(lines)
+    while True:
+        located = list(itertools.islice(clauses, chunk_size))
+        if not located:
+            break
+        results = parse_commands(nlp, [clause for _, clause in located], batch_size=batch_size, rules=rules,
+                                 cache=cache, pool=pool, conditional_ner=conditional_ner)
+        for (line_number, clause), result in zip(located, results):
+            for command in clause_steps(result["parsed"]):
+                if command["command"] == "REJECT":
+                    plan["errors"].append({"line": line_number, "text": clause, "reason": command["reason"]})
+                else:
+                    plan["steps"].append(dict(command, step=len(plan["steps"]) + 1, line=line_number, text=clause))
+    return plan
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile a mission script into an ordered command plan")
+    parser.add_argument("mission", help="Text file, one command (or several joined by 'then'/'and') per line")
+    parser.add_argument("--output", default=None, help="Where to save the plan as JSON (default: print it)")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--no-fast-path", action="store_true", help="Send every clause through the model")
+    parser.add_argument("--strict", action="store_true", help="Exit with an error if any clause is rejected")
+    args = parser.parse_args()
+
+    nlp = load_model()
+    if nlp is None:
+        print("ERROR: Could not find model files.")
+        exit(1)
+
+    with open(args.mission) as f:
+        plan = compile_mission(nlp, f, batch_size=args.batch_size,
+                               rules=None if args.no_fast_path else RuleParser())
+
+    for error in plan["errors"]:
+        print(f"Line {error['line']}: REJECT '{error['text']}' ({error['reason']})")
+    print(f"Compiled {len(plan['steps'])} steps ({len(plan['errors'])} rejected).")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(plan, f, indent=2)
+        print(f"Saved plan to {args.output}")
+    else:
+        for step in plan["steps"]:
+            print(json.dumps(step))
+
+    if args.strict and plan["errors"]:
+        exit(1)
@@ -0,0 +1,185 @@
+import copy
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+DEFAULT_CAPACITY = 4096
+
+# "north-east", "North  East" and "north east" are the same command
+DIAGONAL_RE = re.compile(r"\b(north|south)[\s\-]+(east|west)\b")
+SPACES_RE = re.compile(r"\s+")
+SEPARATOR_RE = re.compile(r"[\s\-]+")
+
+
+# --- 1. Keys ---
+def normalize_command(command):
+    text = SPACES_RE.sub(" ", command.strip().lower())
+    return DIAGONAL_RE.sub(r"\1 \2", text)
+
+def respell(value, command):
+    """
+    value as it is spelled in command, e.g. "North  East" for a cached
+    "north-east". Returns value unchanged if command doesn't contain it.
+    """
+    words = [re.escape(word) for word in SEPARATOR_RE.split(value.strip()) if word]
+    match = re.search(r"[\s\-]+".join(words), command, re.IGNORECASE) if words else None
+    return match.group(0) if match else value
+
+def model_version(model_path):
+    """
+    Version string for a trained model folder. spaCy leaves meta.json's
+    "version" at 0.0.0 after every retrain, so we also hash the whole file
+    (its scores change on every run) to make sure old entries are never reused.
+    """
+    if model_path is None:
+        return "no-model"
+    meta_path = os.path.join(model_path, "meta.json")
+    if not os.path.exists(meta_path):
+        return "no-meta"
+    with open(meta_path, "rb") as f:
+        raw = f.read()
+    meta = json.loads(raw)
+    digest = hashlib.sha1(raw).hexdigest()[:12]
+    return f"{meta.get('name', 'pipeline')}-{meta.get('version', '0.0.0')}-{digest}"
+
+
+# --- 2. The Cache ---
+class ParseCache:
+    """
+    LRU cache of parse results ({parsed, final_command}) keyed on the
+    normalized command text plus the model version.
+
+    With db_path set, entries are also written to a small SQLite table so
+    they survive restarts. The in-memory LRU always sits in front of it.
+    Use put_many for a whole batch: its rows go to disk in one transaction.
+    """
+
+    def __init__(self, version, capacity=DEFAULT_CAPACITY, db_path=None, disk_capacity=None):
+        self.version = version
+        self.capacity = capacity
+        self.disk_capacity = disk_capacity or capacity * 16
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.db = None
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS parse_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, used INTEGER NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS parse_cache_used ON parse_cache (used)")
+            # Results from an older model are useless now
+            self.db.execute("DELETE FROM parse_cache WHERE key NOT LIKE ?", (self._prefix() + "%",))
+            self.db.commit()
+            self._tick, self.disk_rows = self.db.execute(
+                "SELECT COALESCE(MAX(used), 0), COUNT(*) FROM parse_cache").fetchone()
+
+    def _prefix(self):
+        return self.version + "\x00"
+
+    def key(self, command):
+        return self._prefix() + normalize_command(command)
+
+    def get(self, command):
+        """
+        Returns a copy of the cached result for command, or None. The entry
+        may have been cached for a differently spelled command, so the
+        command and slot texts are taken from this one.
+        """
+        key = self.key(command)
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            elif self.db is not None:
+                row = self.db.execute("SELECT value FROM parse_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    result = json.loads(row[0])
+                    self._remember(key, result)
+                    self._touch(key)
+                    self.disk_hits += 1
+            if result is None:
+                self.misses += 1
+                return None
+
+        result = copy.deepcopy(result)
+        parsed = result["parsed"]
+        parsed["command"] = command
+        parsed["slots"] = {label: respell(text, command) for label, text in parsed["slots"].items()}
+        return result
+
+    def put(self, command, result):
+        self.put_many([command], [result])
+
+    def put_many(self, commands, results):
+        """Caches a batch of results, with a single SQLite commit for all of them."""
+        rows = []
+        with self.lock:
+            for command, result in zip(commands, results):
+                key = self.key(command)
+                value = {"parsed": result["parsed"], "final_command": result["final_command"]}
+                self._remember(key, copy.deepcopy(value))
+                if self.db is not None:
+                    self._tick += 1
+                    rows.append((key, json.dumps(value), self._tick))
+            if rows:
+                self.db.executemany("INSERT OR REPLACE INTO parse_cache (key, value, used) VALUES (?, ?, ?)", rows)
+                # Replaced keys don't add rows, so this may overcount until the next trim
+                self.disk_rows += len(rows)
+                if self.disk_rows > self.disk_capacity:
+                    self._trim_disk()
+                self.db.commit()
+
+    def _remember(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def _touch(self, key):
+        self._tick += 1
+        self.db.execute("UPDATE parse_cache SET used = ? WHERE key = ?", (self._tick, key))
+        self.db.commit()
+
+    def _trim_disk(self):
+        # Drop the least recently used rows beyond disk_capacity
+        self.db.execute(
+            "DELETE FROM parse_cache WHERE key IN ("
+            "SELECT key FROM parse_cache ORDER BY used DESC LIMIT -1 OFFSET ?)",
+            (self.disk_capacity,),
+        )
+        self.disk_rows = self.db.execute("SELECT COUNT(*) FROM parse_cache").fetchone()[0]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM parse_cache")
+                self.db.commit()
+                self.disk_rows = 0
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "model_version": self.version,
+        }
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
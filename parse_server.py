@@ -0,0 +1,212 @@
+import time
+_import_start = time.perf_counter()
+
+import argparse
+import gc
+import json
+import os
+import queue
+import threading
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from drone_parser import DEFAULT_BATCH_SIZE, find_model_path, load_model, parse_commands, startup_timings
+from parse_cache import DEFAULT_CAPACITY, ParseCache, model_version
+from pipeline_timing import PipelineTimer
+from rule_parser import RuleParser
+from worker_pool import ParserPool, WorkerError
+
+startup_timings["server_imports_s"] = time.perf_counter() - _import_start
+
+# Max commands we accept in one request (protects the server from huge bodies)
+MAX_BATCH = 10000
+
+# How long a request waits for room in the worker queue before a 503
+SUBMIT_TIMEOUT = 5.0
+
+# How long a request waits for the workers to parse its commands before a 503
+RESULT_TIMEOUT = 30.0
+
+
+def rss_mb(pid="self"):
+    """Resident memory of a process in MB (Linux), or None if it can't be read."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+def process_stats(pool=None):
+    """This server's own memory and live objects, so load tests measure the server, not the client."""
+    stats = {"pid": os.getpid(), "rss_mb": rss_mb(), "gc_objects": len(gc.get_objects())}
+    if pool is not None:
+        stats["worker_rss_mb"] = [rss_mb(worker.pid) for worker in pool.workers]
+    return stats
+
+
+class ParseHandler(BaseHTTPRequestHandler):
+    """
+    Small JSON API around drone_parser.
+
+    POST /parse   {"commands": ["fly 50m north", "land"], "batch_size": 64}
+                  (or {"command": "land"} for a single one)
+    GET  /health  {"status": "ok"}
+    GET  /stats   fast-path hit rate, latency of both paths, cache counters and
+                  the server's own RSS and gc object count
+    GET  /metrics per-stage latency histograms in Prometheus text format
+                  (only when started with --timing)
+    """
+    nlp = None
+    rules = None
+    cache = None
+    timer = None
+    pool = None
+    conditional_ner = False
+    batch_size = DEFAULT_BATCH_SIZE
+    # spaCy pipelines are not meant to be shared between threads
+    nlp_lock = threading.Lock()
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self._send_json(200, {
+                "fast_path": self.rules.stats.report() if self.rules else None,
+                "cache": self.cache.stats() if self.cache else None,
+                "latency": self.timer.summary() if self.timer else None,
+                "workers": self.pool.stats() if self.pool else None,
+                "process": process_stats(self.pool),
+            })
+        elif self.path == "/metrics" and self.timer is not None:
+            body = self.timer.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": "Not found."})
+
+    def do_POST(self):
+        if self.path != "/parse":
+            self._send_json(404, {"error": "Not found."})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError):
+            self._send_json(400, {"error": "Body must be valid JSON."})
+            return
+        if not isinstance(request, dict):
+            self._send_json(400, {"error": "Body must be a JSON object."})
+            return
+
+        if "command" in request:
+            commands = [request["command"]]
+        else:
+            commands = request.get("commands")
+
+        if not isinstance(commands, list) or not all(isinstance(c, str) for c in commands):
+            self._send_json(400, {"error": "'commands' must be a list of strings."})
+            return
+        if len(commands) > MAX_BATCH:
+            self._send_json(413, {"error": f"At most {MAX_BATCH} commands per request."})
+            return
+
+        batch_size = request.get("batch_size", self.batch_size)
+        # bool is a subclass of int, but "batch_size": true is not a size
+        if not isinstance(batch_size, int) or isinstance(batch_size, bool) or batch_size < 1:
+            self._send_json(400, {"error": "'batch_size' must be a positive integer."})
+            return
+
+        # Worker processes each have their own model, so no lock is needed then
+        with nullcontext() if self.pool else self.nlp_lock:
+            try:
+                results = parse_commands(self.nlp, commands, batch_size=batch_size, rules=self.rules,
+                                         cache=self.cache, timer=self.timer, pool=self.pool,
+                                         conditional_ner=self.conditional_ner)
+            except queue.Full:
+                self._send_json(503, {"error": "Parser is overloaded, try again later."})
+                return
+            except WorkerError as e:
+                self._send_json(503, {"error": "Parser worker failed, try again later.", "detail": str(e)})
+                return
+        self._send_json(200, {"results": results})
+
+    def log_message(self, format, *args):
+        # Keep the console quiet under heavy traffic
+        pass
+
+
+def make_server(nlp, host="127.0.0.1", port=8765, batch_size=DEFAULT_BATCH_SIZE, fast_path=True, cache=None,
+                timing=False, pool=None, conditional_ner=False):
+    ParseHandler.nlp = nlp
+    ParseHandler.conditional_ner = conditional_ner
+    ParseHandler.pool = pool
+    ParseHandler.rules = RuleParser() if fast_path else None
+    ParseHandler.cache = cache
+    ParseHandler.timer = PipelineTimer() if timing else None
+    ParseHandler.batch_size = batch_size
+    return ThreadingHTTPServer((host, port), ParseHandler)
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DroneTalk command parsing service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--no-fast-path", action="store_true",
+                        help="Send every command to the spaCy model")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CAPACITY,
+                        help="Number of parse results kept in memory (0 disables the cache)")
+    parser.add_argument("--cache-db", default=None,
+                        help="SQLite file that keeps cached results across restarts")
+    parser.add_argument("--timing", action="store_true",
+                        help="Collect per-stage latency histograms (served on /metrics)")
+    parser.add_argument("--conditional-ner", action="store_true",
+                        help="Skip ner for intents that don't use slots (land, takeoff, scan, ...)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Run the model in N forked worker processes (0 = in the server process)")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="Batches allowed to wait for a worker before requests get a 503")
+    args = parser.parse_args()
+
+    nlp = load_model()
+    if nlp is None:
+        print("ERROR: Could not find model files.")
+        exit(1)
+
+    cache = None
+    if args.cache_size > 0:
+        cache = ParseCache(model_version(find_model_path()), args.cache_size, db_path=args.cache_db)
+
+    print("Startup: " + ", ".join(f"{phase}={seconds:.2f}s" for phase, seconds in startup_timings.items()))
+
+    pool = None
+    if args.workers > 0:
+        # Fork before the server starts any threads
+        pool = ParserPool(nlp, args.workers, args.batch_size, args.max_pending, SUBMIT_TIMEOUT,
+                          conditional_ner=args.conditional_ner, result_timeout=RESULT_TIMEOUT).start()
+        print(f"Started {args.workers} parser workers.")
+
+    server = make_server(nlp, args.host, args.port, args.batch_size,
+                         fast_path=not args.no_fast_path, cache=cache, timing=args.timing, pool=pool,
+                         conditional_ner=args.conditional_ner)
+    print(f"DroneTalk parser listening on http://{args.host}:{args.port}/parse")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down.")
+        server.server_close()
+        if pool is not None:
+            pool.close()
@@ -0,0 +1,131 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Bucket upper bounds in seconds: 1us ... ~10s, 8 buckets per power of ten.
+# Fixed buckets keep memory constant no matter how long the server runs.
+BUCKETS = [10 ** (exp / 8) * 1e-6 for exp in range(0, 57)]
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+# --- 1. Histogram ---
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds, n=1):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += n
+        self.count += n
+        self.total += seconds * n
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th sample."""
+        if self.count == 0:
+            return 0.0
+        rank = math.ceil(q * self.count)
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+# --- 2. Timer ---
+class PipelineTimer:
+    """
+    Opt-in latency collector. Pass one to drone_parser.parse_commands(...,
+    timer=timer) to get a histogram per stage: "tokenizer", one per spaCy
+    component ("tok2vec", "ner", "textcat_multilabel"), "generate_command"
+    and "normalize_slot". Batched stages record batch time / batch size, i.e.
+    the cost per command.
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def record(self, stage, seconds, n=1):
+        with self.lock:
+            hist = self.histograms.get(stage)
+            if hist is None:
+                hist = self.histograms[stage] = LatencyHistogram()
+            hist.add(seconds, n)
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def wrap(self, func, stage):
+        def timed(*args, **kwargs):
+            with self.time(stage):
+                return func(*args, **kwargs)
+        return timed
+
+    def pipe(self, nlp, texts, batch_size=64):
+        """Drop-in for nlp.pipe that times the tokenizer and every component."""
+        batch = []
+        for text in texts:
+            batch.append(text)
+            if len(batch) >= batch_size:
+                yield from self._run_batch(nlp, batch, batch_size)
+                batch = []
+        if batch:
+            yield from self._run_batch(nlp, batch, batch_size)
+
+    def _run_batch(self, nlp, texts, batch_size):
+        start = time.perf_counter()
+        docs = [nlp.make_doc(text) for text in texts]
+        self.record("tokenizer", (time.perf_counter() - start) / len(docs), len(docs))
+
+        for name, proc in nlp.pipeline:
+            start = time.perf_counter()
+            if hasattr(proc, "pipe"):
+                docs = list(proc.pipe(docs, batch_size=batch_size))
+            else:
+                docs = [proc(doc) for doc in docs]
+            self.record(name, (time.perf_counter() - start) / len(docs), len(docs))
+        return docs
+
+    def summary(self):
+        """{stage: {count, mean_ms, p50_ms, p95_ms, p99_ms}}"""
+        with self.lock:
+            return {
+                stage: {
+                    "count": hist.count,
+                    "mean_ms": 1000 * hist.mean(),
+                    **{f"p{int(q * 100)}_ms": 1000 * hist.quantile(q) for q in QUANTILES},
+                }
+                for stage, hist in self.histograms.items()
+            }
+
+    def prometheus(self, metric="dronetalk_stage_latency_seconds"):
+        """The histograms as a Prometheus text-format summary."""
+        lines = [
+            f"# HELP {metric} Per-command latency of each parsing stage.",
+            f"# TYPE {metric} summary",
+        ]
+        with self.lock:
+            for stage, hist in sorted(self.histograms.items()):
+                for q in QUANTILES:
+                    lines.append(f'{metric}{{stage="{stage}",quantile="{q}"}} {hist.quantile(q):.9f}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {hist.total:.9f}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {hist.count}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
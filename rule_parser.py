@@ -0,0 +1,148 @@
+import re
+import time
+
+from spacy_training_data_1000 import INTENT_KEYWORDS, PATTERNS
+
+# --- 1. Compile the rules ---
+# One alternation per intent. We search every intent separately (just like
+# convert_to_spacy_format did when it made the labels), so "go home" still
+# hits both 'fly' and 'return' and is treated as ambiguous.
+INTENT_RES = {
+    intent: re.compile(
+        r"\b(" + "|".join(re.escape(kw) for kw in sorted(keywords, key=len, reverse=True)) + r")\b"
+    )
+    for intent, keywords in INTENT_KEYWORDS.items()
+}
+
+# Words that can be left over once keywords and slots are removed.
+# Anything else means the sentence says something the rules don't understand.
+FILLER_WORDS = {
+    "a", "an", "the", "to", "for", "by", "of", "me", "at", "in", "on",
+    "please", "now", "drone", "it", "place", "side", "area", "surroundings",
+    "mission", "pics", "pictures", "photos", "images", "shots",
+}
+
+# Some numbers like "10m" match both DISTANCE and DURATION.
+# We only pick one when the intent makes the meaning clear.
+OVERLAP_PREFERENCE = {"fly": "DISTANCE", "hover": "DURATION", "scan": "DURATION"}
+
+WORD_RE = re.compile(r"[a-z0-9][a-z0-9.\-]*")
+
+
+# --- 2. Fast Path Statistics ---
+class FastPathStats:
+    """Counts fast-path hits and the time spent in each path."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.rule_hits = 0
+        self.model_calls = 0
+        self.rule_seconds = 0.0
+        self.model_seconds = 0.0
+
+    def record_rules(self, n_hits, seconds):
+        self.rule_hits += n_hits
+        self.rule_seconds += seconds
+
+    def record_model(self, n_commands, seconds):
+        self.model_calls += n_commands
+        self.model_seconds += seconds
+
+    def report(self):
+        total = self.rule_hits + self.model_calls
+        return {
+            "commands": total,
+            "fast_path_hits": self.rule_hits,
+            "model_calls": self.model_calls,
+            "hit_rate": self.rule_hits / total if total else 0.0,
+            # Rule time is spent on every command (hits and misses)
+            "rules_us_per_command": 1e6 * self.rule_seconds / total if total else 0.0,
+            "model_us_per_command": 1e6 * self.model_seconds / self.model_calls if self.model_calls else 0.0,
+        }
+
+
+# --- 3. The Rule-Based Parser ---
+class RuleParser:
+    """
+    Handles formulaic commands ("land", "RTL", "fly 50m north") without the
+    spaCy model. parse() returns the same {command, intents, slots} JSON as
+    drone_parser.doc_to_json, or None when the command is ambiguous and
+    should go to the model instead.
+    """
+
+    def __init__(self):
+        self.stats = FastPathStats()
+
+    def find_entities(self, command, intent):
+        matches = []
+        for label, pattern in PATTERNS.items():
+            for match in pattern.finditer(command):
+                if label == "COUNT_SIMPLE":
+                    start, end = match.span("value")
+                    matches.append((start, end, "COUNT"))
+                else:
+                    matches.append((match.start(), match.end(), label))
+
+        # Same span claimed by two labels: let the intent decide, or give up
+        by_span = {}
+        for start, end, label in matches:
+            by_span.setdefault((start, end), set()).add(label)
+        for span, labels in by_span.items():
+            if len(labels) > 1:
+                preferred = OVERLAP_PREFERENCE.get(intent)
+                if preferred not in labels:
+                    return None
+                by_span[span] = {preferred}
+
+        # Longest match first, then drop overlaps (same as the annotator)
+        entities = []
+        current_pos = -1
+        for (start, end), labels in sorted(by_span.items(), key=lambda x: (x[0][0], -(x[0][1] - x[0][0]))):
+            if start >= current_pos:
+                entities.append((start, end, labels.pop()))
+                current_pos = end
+        return entities
+
+    def parse(self, command):
+        text = command.strip()
+        lower = text.lower()
+
+        intents = [intent for intent, regex in INTENT_RES.items() if regex.search(lower)]
+        if len(intents) != 1:
+            return None
+        intent = intents[0]
+
+        entities = self.find_entities(text, intent)
+        if entities is None:
+            return None
+
+        slots = {}
+        for start, end, label in entities:
+            if label.lower() in slots:
+                # Two distances, two directions, ... -> compound command
+                return None
+            slots[label.lower()] = text[start:end]
+
+        # Blank out slots and keywords; only filler words may remain
+        chars = list(lower)
+        for start, end, _ in entities:
+            chars[start:end] = " " * (end - start)
+        leftover = INTENT_RES[intent].sub(" ", "".join(chars))
+        for word in WORD_RE.findall(leftover):
+            if word not in FILLER_WORDS:
+                return None
+
+        return {"command": command, "intents": [intent], "slots": slots}
+
+    def split(self, commands):
+        """
+        Tries the rules on a batch. Returns (parsed, misses) where parsed[i]
+        is the JSON or None and misses lists the indexes the model must handle.
+        """
+        start = time.perf_counter()
+        parsed = [self.parse(command) for command in commands]
+        misses = [i for i, p in enumerate(parsed) if p is None]
+        self.stats.record_rules(len(commands) - len(misses), time.perf_counter() - start)
+        return parsed, misses
@@ -0,0 +1,188 @@
+import argparse
+import re
+import time
+
+# NumPy is only imported by the batch helpers (and DIRECTION_TABLE), so the
+# per-command path through drone_parser.generate_command stays light.
+
+# --- 1. Tables ---
+# Canonical units: meters, seconds and whole counts. Everything the
+# PATTERNS in spacy_training_data_1000.py accept is listed; an unknown unit
+# keeps the number as it is (what clean_value always did).
+UNIT_SCALES = {
+    "distance": {
+        "": 1.0, "m": 1.0, "meter": 1.0, "meters": 1.0, "metre": 1.0, "metres": 1.0,
+        "ft": 0.3048, "foot": 0.3048, "feet": 0.3048,
+        "km": 1000.0, "kilometer": 1000.0, "kilometers": 1000.0, "kilometre": 1000.0, "kilometres": 1000.0,
+    },
+    "duration": {
+        "": 1.0, "s": 1.0, "sec": 1.0, "secs": 1.0, "second": 1.0, "seconds": 1.0,
+        # A duration of "10m" is ten minutes (PATTERNS["DURATION"] reads it that way)
+        "m": 60.0, "min": 60.0, "mins": 60.0, "minute": 60.0, "minutes": 60.0,
+        "h": 3600.0, "hr": 3600.0, "hour": 3600.0, "hours": 3600.0,
+    },
+    # "3 photos", "5 shots": the word after the number is what is counted
+    "count": {},
+}
+
+# Axes are x = east, y = north, z = altitude
+_D = 0.5 ** 0.5
+DIRECTION_VECTORS = {
+    "none": (0.0, 0.0, 0.0),   # anything we don't understand moves nowhere
+    "north": (0.0, 1.0, 0.0),
+    "south": (0.0, -1.0, 0.0),
+    "east": (1.0, 0.0, 0.0),
+    "west": (-1.0, 0.0, 0.0),
+    "north east": (_D, _D, 0.0),
+    "north west": (-_D, _D, 0.0),
+    "south east": (_D, -_D, 0.0),
+    "south west": (-_D, -_D, 0.0),
+    "up": (0.0, 0.0, 1.0),
+    "down": (0.0, 0.0, -1.0),
+}
+DIRECTION_NAMES = list(DIRECTION_VECTORS)
+_direction_table = None
+
+DIRECTION_ALIASES = {"ne": "north east", "nw": "north west", "se": "south east", "sw": "south west"}
+DIRECTION_INDEX = {name: i for i, name in enumerate(DIRECTION_NAMES)}
+DIRECTION_INDEX.update({alias: DIRECTION_INDEX[name] for alias, name in DIRECTION_ALIASES.items()})
+
+VALUE_RE = re.compile(r"(\d+(?:\.\d+)?)\s*([a-z]*)", re.I)
+
+# Slot strings repeat a lot ("50m", "10 seconds"), so each distinct one is
+# only parsed once. The memo stops growing at this size.
+MAX_MEMO = 1 << 16
+_memo = {kind: {} for kind in UNIT_SCALES}
+_direction_memo = {}
+
+
+def direction_table():
+    """DIRECTION_VECTORS as an (n, 3) array, one row per DIRECTION_NAMES entry (built on first use)."""
+    global _direction_table
+    if _direction_table is None:
+        import numpy as np
+        _direction_table = np.array([DIRECTION_VECTORS[name] for name in DIRECTION_NAMES])
+    return _direction_table
+
+def __getattr__(name):
+    # `from slot_normalizer import DIRECTION_TABLE` still works, without a NumPy import at load time
+    if name == "DIRECTION_TABLE":
+        return direction_table()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# --- 2. One Value ---
+def normalize_value(kind, text):
+    """
+    '331ft' -> 100.89 (meters), '2 minutes' -> 120.0 (seconds),
+    '3 photos' -> 3. kind is 'distance', 'duration' or 'count'.
+    Returns None when there is no number.
+    """
+    if not text:
+        return None
+    memo = _memo[kind]
+    if text in memo:
+        return memo[text]
+
+    value = None
+    match = VALUE_RE.search(str(text))
+    if match:
+        value = float(match.group(1)) * UNIT_SCALES[kind].get(match.group(2).lower(), 1.0)
+        if kind == "count":
+            value = int(value)
+    if len(memo) < MAX_MEMO:
+        memo[text] = value
+    return value
+
+def direction_index(direction):
+    """'North-East', 'north  east' and 'NE' all map to the same row of DIRECTION_TABLE (0 = unknown)."""
+    if direction in _direction_memo:
+        return _direction_memo[direction]
+    key = " ".join((direction or "").lower().replace("-", " ").split())
+    index = DIRECTION_INDEX.get(key, 0)
+    if len(_direction_memo) < MAX_MEMO:
+        _direction_memo[direction] = index
+    return index
+
+def canonical_direction(direction):
+    """The DIRECTION_TABLE name for a direction, or the cleaned-up text if it isn't in the table."""
+    index = direction_index(direction)
+    if index:
+        return DIRECTION_NAMES[index]
+    return " ".join((direction or "").lower().replace("-", " ").split()) or None
+
+
+# --- 3. Whole Batches ---
+def _table_map(texts, func, dtype):
+    """Applies func once per distinct text, then maps the batch through that table."""
+    import numpy as np
+    texts = list(texts)
+    table = {text: func(text) for text in dict.fromkeys(texts)}
+    return np.fromiter(map(table.__getitem__, texts), dtype=dtype, count=len(texts))
+
+def normalize_batch(kind, texts):
+    """
+    Slot strings -> float array in canonical units (NaN where there is no
+    value). Distinct strings are parsed once, however long the batch is.
+    """
+    def value(text):
+        result = normalize_value(kind, text)
+        return float("nan") if result is None else result
+    return _table_map(texts, value, float)
+
+def direction_indices(directions):
+    """Directions -> array of DIRECTION_TABLE rows."""
+    import numpy as np
+    return _table_map(directions, direction_index, np.intp)
+
+def direction_vectors(directions):
+    """Directions -> (n, 3) unit vectors (zeros for unknown directions)."""
+    return direction_table()[direction_indices(directions)]
+
+def normalize_slots(slot_dicts):
+    """
+    A batch of parsed["slots"] dicts -> arrays: distance_m, duration_s,
+    count (NaN when missing) and direction (DIRECTION_TABLE rows).
+    """
+    slot_dicts = list(slot_dicts)
+    return {
+        "distance_m": normalize_batch("distance", [s.get("distance") for s in slot_dicts]),
+        "duration_s": normalize_batch("duration", [s.get("duration") for s in slot_dicts]),
+        "count": normalize_batch("count", [s.get("count") for s in slot_dicts]),
+        "direction": direction_indices([s.get("direction") for s in slot_dicts]),
+    }
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark slot normalisation on a large batch")
+    parser.add_argument("--size", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import random
+    import data_generator_1000 as generator
+    rng = random.Random(args.seed)
+    distances = [generator.random_distance(rng) for _ in range(args.size)]
+    directions = [rng.choice(generator.all_directions) for _ in range(args.size)]
+
+    def old_clean_value(value_str):
+        # What generate_command used to do: one re.search per slot, units ignored
+        match = re.search(r"(\d+(\.\d+)?)", str(value_str))
+        return float(match.group(1)) if match else None
+
+    start = time.perf_counter()
+    old = [old_clean_value(d) for d in distances]
+    old_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    meters = normalize_batch("distance", distances)
+    batch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectors = direction_vectors(directions)
+    direction_seconds = time.perf_counter() - start
+
+    print(f"{args.size} distances: per-call regex {old_seconds:.2f}s, batch normalizer {batch_seconds:.2f}s")
+    print(f"{args.size} directions -> vectors: {direction_seconds:.2f}s")
+    print(f"e.g. {distances[0]!r} -> {meters[0]:.2f} m, {directions[0]!r} -> {vectors[0].round(3).tolist()}")
@@ -1,6 +1,7 @@
-import pandas as pd
+import argparse
 import re
 import json
+import multiprocessing
 import warnings
 
 # --- 1. Define Intent Keywords ---
@@ -35,80 +36,129 @@ PATTERNS = {
     "COUNT_SIMPLE": re.compile(r'\b(take|snap|get|capture)\s+(?P<value>\d+)\b', re.I)
 }
 
-# --- 3. The Conversion Function ---
-def convert_to_spacy_format(df):
+# --- 3. One Regex For All Intent Keywords ---
+def compile_intent_matcher(intent_keywords):
+    """
+    Builds a single regex that finds every intent keyword in one scan.
+    The lookahead lets matches overlap, and since the alternation only
+    reports the longest keyword at each position, a longer keyword also
+    carries the intents of any shorter keyword it starts with
+    ("go home" -> return + fly, same as searching "go" on its own).
+    """
+    keywords = sorted({kw for kws in intent_keywords.values() for kw in kws}, key=len, reverse=True)
+    intents_for = {kw: set() for kw in keywords}
+    for intent, kws in intent_keywords.items():
+        for kw in kws:
+            intents_for[kw].add(intent)
+
+    for long_kw in keywords:
+        for short_kw in keywords:
+            if short_kw != long_kw and re.match(rf"{re.escape(short_kw)}\b", long_kw):
+                intents_for[long_kw] |= intents_for[short_kw]
+
+    regex = re.compile(r"(?=\b(" + "|".join(re.escape(kw) for kw in keywords) + r")\b)")
+    return regex, intents_for
+
+INTENT_REGEX, INTENTS_FOR_KEYWORD = compile_intent_matcher(INTENT_KEYWORDS)
+
+# --- 4. The Annotator ---
+def find_entities(command):
+    # We must find the LONGEST match first (e.g., "north east" before "east")
+    # To do this, we find all matches, sort them by length, and remove overlaps
+    all_matches = []
+    for label, pattern in PATTERNS.items():
+        for match in pattern.finditer(command):
+            if label == "COUNT_SIMPLE":
+                # Handle simple count pattern (e.g., "take 3"): just label the "3"
+                val_start, val_end = match.span('value')
+                all_matches.append((val_start, val_end, "COUNT"))
+            else:
+                all_matches.append((match.start(), match.end(), label))
+
+    # Sort matches by start position, then by length (longest first)
+    all_matches.sort(key=lambda x: (x[0], -(x[1] - x[0])))
+
+    # Add non-overlapping entities
+    entities = []
+    current_pos = -1
+    for start, end, label in all_matches:
+        if start >= current_pos:
+            entities.append((start, end, label))
+            current_pos = end
+    return entities
+
+def annotate_batch(commands):
+    """
+    Annotates a list of command strings. Returns one
+    (command, {"entities": ..., "cats": ...}) tuple per command that has
+    at least one intent, in input order.
+    """
     training_data = []
-    
-    for _, row in df.iterrows():
-        command = str(row['command'])
-        if pd.isna(command):
+    for command in commands:
+        matched = set()
+        for match in INTENT_REGEX.finditer(command.lower()):
+            matched |= INTENTS_FOR_KEYWORD[match.group(1)]
+        if not matched:
             continue
 
-        command_lower = command.lower()
-        
-        # --- A. Find Slots (NER Entities) ---
-        entities = []
-        
-        # We must find the LONGEST match first (e.g., "north east" before "east")
-        # To do this, we find all matches, sort them by length, and remove overlaps
-        all_matches = []
-        for label, pattern in PATTERNS.items():
-            for match in pattern.finditer(command):
-                span = (match.start(), match.end(), label)
-                
-                # Handle simple count pattern (e.g., "take 3")
-                if label == "COUNT_SIMPLE":
-                    val_start, val_end = match.span('value')
-                    span = (val_start, val_end, "COUNT") # Just label the "3"
-
-                all_matches.append(span)
-
-        # Sort matches by start position, then by length (longest first)
-        all_matches.sort(key=lambda x: (x[0], -(x[1] - x[0])))
-
-        # Add non-overlapping entities
-        current_pos = -1
-        for start, end, label in all_matches:
-            if start >= current_pos:
-                entities.append((start, end, label))
-                current_pos = end
-            
-        # --- B. Find Intents (Text Categories) ---
-        cats = {intent: False for intent in ALL_INTENTS}
-        found_intent = False
-        for intent, keywords in INTENT_KEYWORDS.items():
-            for kw in keywords:
-                if re.search(rf"\b{kw}\b", command_lower):
-                    cats[intent] = True
-                    found_intent = True
-        
-        if not found_intent:
-            continue 
+        cats = {intent: intent in matched for intent in ALL_INTENTS}
+        training_data.append((command, {"entities": find_entities(command), "cats": cats}))
+    return training_data
 
-        # --- C. Create the final spaCy data tuple ---
-        spacy_example = (command, {"entities": entities, "cats": cats})
-        training_data.append(spacy_example)
-        
+def convert_to_spacy_format(df, workers=1, chunk_size=20000):
+    """
+    Annotates the "command" column of df. With workers > 1 the column is
+    split into chunks that are annotated in parallel (order is kept).
+    """
+    commands = df["command"].astype(str).tolist()
+    chunks = [commands[i:i + chunk_size] for i in range(0, len(commands), chunk_size)]
+
+    training_data = []
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            training_data.extend(annotate_batch(chunk))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for batch in pool.imap(annotate_batch, chunks):
+                training_data.extend(batch)
     return training_data
 
-# --- 4. Main Execution ---
+# --- 5. Main Execution ---
 if __name__ == "__main__":
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Label drone commands for spaCy training")
+    parser.add_argument("--input", default="drone_commands_1000.csv")
+    parser.add_argument("--output", default="spacy_training_data_1000.json")
+    parser.add_argument("--workers", type=int, default=1, help="Annotate chunks in N processes")
+    args = parser.parse_args()
+
     try:
         # *** THIS IS THE IMPORTANT CHANGE ***
-        df = pd.read_csv("drone_commands_1000.csv")
-        print(f"Loaded {len(df)} commands from drone_commands_1000.csv.")
+        df = pd.read_csv(args.input)
+        print(f"Loaded {len(df)} commands from {args.input}.")
         
         warnings.filterwarnings("ignore", message=r".*overlapping spans.*")
 
-        spacy_data = convert_to_spacy_format(df)
+        spacy_data = convert_to_spacy_format(df, workers=args.workers)
         
         print(f"Converted {len(spacy_data)} commands to spaCy format.")
 
-        # Save to a new JSON file
-        with open("spacy_training_data_1000.json", "w") as f:
-            json.dump(spacy_data, f, indent=2)
+        # Save to a new JSON file (.jsonl = one example per line, which
+        # convert_data_1000.py can stream; .dtb = compact binary format
+        # from training_data_store.py)
+        if args.output.endswith(".dtb"):
+            from training_data_store import write_store
+            write_store(args.output, spacy_data)
+        elif args.output.endswith(".jsonl"):
+            with open(args.output, "w") as f:
+                for example in spacy_data:
+                    f.write(json.dumps(example) + "\n")
+        else:
+            with open(args.output, "w") as f:
+                json.dump(spacy_data, f, indent=2)
             
-        print(f"Saved training data to spacy_training_data_1000.json")
+        print(f"Saved training data to {args.output}")
 
         # --- Show a sample of what we created ---
         print("\n--- Example of Training Data ---")
@@ -128,7 +178,7 @@ if __name__ == "__main__":
         print("}")
 
     except FileNotFoundError:
-        print("ERROR: drone_commands_1000.csv not found.")
+        print(f"ERROR: {args.input} not found.")
         print("Please make sure you ran data_generator_1000.py first!")
     except Exception as e:
         print(f"An error occurred: {e}")
\ No newline at end of file
@@ -0,0 +1,348 @@
+import argparse
+import glob
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from slot_normalizer import DIRECTION_NAMES, canonical_direction, direction_index
+
+# --- 1. File Layout ---
+# A log is a directory of segments: telemetry-00000.bin, telemetry-00001.bin, ...
+# Each segment is preallocated to hold segment_records records:
+# header  : magic, version, record size, capacity, record count   (HEADER_FMT)
+# records : RECORD_DTYPE, back to back (count of them are valid)
+# The count is rewritten after every append, so a crash loses at most the
+# record being written. directions.txt lists the directions that have no
+# fixed code (see DirectionCodes).
+MAGIC = b"DTTL"
+VERSION = 2
+HEADER_FMT = "<4sHHQQ"
+HEADER_SIZE = 32
+SEGMENT_RECORDS = 1 << 16
+
+RECORD_DTYPE = np.dtype([
+    ("time", "<f8"),           # seconds since the epoch
+    ("drone", "<u4"),
+    ("command", "u1"),         # index into COMMANDS
+    ("direction", "u1"),       # DirectionCodes code, or HOME
+    ("count", "<u4"),          # CAPTURE_IMAGE count
+    ("value", "<f8"),          # distance_meters or duration_seconds
+    ("position", "<f8", (3,)),  # where the drone was after the command
+])
+
+# Commands generate_command can produce (REJECTs are never executed)
+COMMANDS = ["OTHER", "MOVE", "HOVER", "LAND", "CAPTURE_IMAGE", "SCAN_AREA", "TAKEOFF", "RECORD", "START", "STOP"]
+COMMAND_INDEX = {name: i for i, name in enumerate(COMMANDS)}
+HOME = 255
+MAX_COUNT = np.iinfo(RECORD_DTYPE["count"]).max
+
+# Fixed direction codes: the rows of slot_normalizer.DIRECTION_TABLE, then
+# the drone-relative directions the parser also accepts
+DIRECTIONS = DIRECTION_NAMES + ["forward", "backward", "left", "right"]
+
+def segment_path(directory, index):
+    return os.path.join(directory, f"telemetry-{index:05d}.bin")
+
+
+class DirectionCodes:
+    """
+    Direction text <-> the one-byte code stored in each record. Directions
+    outside DIRECTIONS get the next free code, and they are appended to
+    directions.txt before any record uses them, so every direction
+    generate_command produced reads back exactly.
+    """
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, "directions.txt")
+        self.names = list(DIRECTIONS)
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                self.names += [line.rstrip("\n") for line in f if line.strip()]
+        self.codes = {name: i for i, name in enumerate(self.names)}
+        self.lock = threading.Lock()
+
+    def code(self, direction):
+        if direction == "home":
+            return HOME
+        index = direction_index(direction)
+        if index:
+            return index
+        text = canonical_direction(direction)
+        if text is None:
+            return 0
+        if text in self.codes:
+            return self.codes[text]
+        with self.lock:
+            if text not in self.codes:
+                if len(self.names) >= HOME:
+                    raise ValueError(f"Too many distinct directions to log {text!r}.")
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(text + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.names.append(text)
+                self.codes[text] = len(self.names) - 1
+            return self.codes[text]
+
+    def name(self, code):
+        return "home" if code == HOME else self.names[code]
+
+
+def encode(command, directions):
+    """Command JSON -> (command, direction, count, value) record fields. directions is a DirectionCodes."""
+    name = command.get("command", "")
+    count = int(command.get("count") or 0)
+    if not 0 <= count <= MAX_COUNT:
+        raise ValueError(f"count {count} doesn't fit in a telemetry record (0-{MAX_COUNT}).")
+    return (
+        COMMAND_INDEX.get(name, 0),
+        directions.code(command.get("direction")),
+        count,
+        float(command.get("distance_meters") or command.get("duration_seconds") or 0.0),
+    )
+
+def decode(record, directions):
+    """One record -> the command JSON generate_command made."""
+    name = COMMANDS[record["command"]]
+    command = {"command": name}
+    if name == "MOVE":
+        command["direction"] = directions.name(int(record["direction"]))
+        command["distance_meters"] = float(record["value"])
+    elif name == "HOVER":
+        command["duration_seconds"] = float(record["value"])
+    elif name == "CAPTURE_IMAGE":
+        command["count"] = int(record["count"])
+    return command
+
+
+# --- 2. Segments ---
+class Segment:
+    """One preallocated segment file, memory-mapped as a record array."""
+
+    def __init__(self, path, capacity=SEGMENT_RECORDS, writable=False):
+        self.path = path
+        if writable and not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.write(struct.pack(HEADER_FMT, MAGIC, VERSION, RECORD_DTYPE.itemsize, capacity, 0))
+                f.truncate(HEADER_SIZE + capacity * RECORD_DTYPE.itemsize)
+
+        self.file = open(path, "r+b" if writable else "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        magic, version, record_size, self.capacity, self.count = struct.unpack_from(HEADER_FMT, self.mm, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError(f"{path} is not a version {VERSION} telemetry segment.")
+        self.records = np.ndarray((self.capacity,), dtype=RECORD_DTYPE, buffer=self.mm, offset=HEADER_SIZE)
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def set_count(self, count):
+        self.count = count
+        struct.pack_into("<Q", self.mm, struct.calcsize(HEADER_FMT) - 8, count)
+
+    def valid(self):
+        return self.records[:self.count]
+
+    def close(self):
+        # Drop our own view first, or mmap refuses to close
+        self.records = None
+        self.mm.close()
+        self.file.close()
+
+
+# --- 3. Writing ---
+class TelemetryLog:
+    """
+    Append-only log of executed commands and the positions they led to.
+
+        log = TelemetryLog("telemetry")
+        log.append(0, {"command": "MOVE", "direction": "north", "distance_meters": 50.0}, fleet.positions[0])
+
+    Timestamps never go backwards (a clock step back reuses the last one),
+    so readers can binary-search them.
+    """
+
+    def __init__(self, directory, segment_records=SEGMENT_RECORDS):
+        self.directory = directory
+        self.segment_records = segment_records
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.directions = DirectionCodes(directory)
+
+        existing = sorted(glob.glob(os.path.join(directory, "telemetry-*.bin")))
+        self.segment_index = len(existing) - 1 if existing else 0
+        self.segment = Segment(segment_path(directory, self.segment_index), segment_records, writable=True)
+        self.last_time = float(self.segment.records[self.segment.count - 1]["time"]) if self.segment.count else 0.0
+
+    def _room(self):
+        if self.segment.full:
+            self.segment.mm.flush()
+            self.segment.close()
+            self.segment_index += 1
+            self.segment = Segment(segment_path(self.directory, self.segment_index), self.segment_records,
+                                   writable=True)
+        return self.segment.capacity - self.segment.count
+
+    def append(self, drone_id, command, position, timestamp=None):
+        self.append_batch([drone_id], [command], [position], None if timestamp is None else [timestamp])
+
+    def append_batch(self, drone_ids, commands, positions, timestamps=None):
+        """Appends one record per command. positions are (x, y, z) after each command."""
+        n = len(drone_ids)
+        batch = np.zeros(n, dtype=RECORD_DTYPE)
+        batch["time"] = time.time() if timestamps is None else timestamps
+        batch["drone"] = drone_ids
+        fields = [encode(command, self.directions) for command in commands]
+        if fields:
+            batch["command"], batch["direction"], batch["count"], batch["value"] = zip(*fields)
+        batch["position"] = np.asarray(positions, dtype=float).reshape(n, 3)
+
+        with self.lock:
+            batch["time"] = np.maximum.accumulate(np.maximum(batch["time"], self.last_time))
+            written = 0
+            while written < n:
+                take = min(self._room(), n - written)
+                start = self.segment.count
+                self.segment.records[start:start + take] = batch[written:written + take]
+                self.segment.set_count(start + take)
+                written += take
+            if n:
+                self.last_time = float(batch["time"][-1])
+
+    def flush(self):
+        with self.lock:
+            self.segment.mm.flush()
+
+    def close(self):
+        self.flush()
+        self.segment.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- 4. Reading and Replay ---
+class TelemetryReader:
+    """
+    Read-only view of a telemetry directory. Segments stay memory-mapped,
+    so opening is instant and replay never parses any text.
+
+        with TelemetryReader("telemetry") as log:
+            positions = log.state_at(timestamp)
+            for batch in log.replay(start, end):
+                ...
+    """
+
+    def __init__(self, directory):
+        self.segments = [Segment(path) for path in sorted(glob.glob(os.path.join(directory, "telemetry-*.bin")))]
+        self.directions = DirectionCodes(directory)
+        self.starts = np.cumsum([0] + [segment.count for segment in self.segments])
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        seg = int(np.searchsorted(self.starts, i, side="right")) - 1
+        return self.segments[seg].records[i - self.starts[seg]]
+
+    def seek(self, timestamp, side="right"):
+        """
+        Index of the first record after timestamp (so records[:i] happened
+        by then). With side="left", the first record at or after it.
+        """
+        for seg, segment in enumerate(self.segments):
+            times = segment.valid()["time"]
+            if len(times) and (times[-1] >= timestamp if side == "left" else times[-1] > timestamp):
+                return int(self.starts[seg] + np.searchsorted(times, timestamp, side=side))
+        return len(self)
+
+    def replay(self, start=None, end=None):
+        """Yields record arrays (one slice per segment) with start <= time <= end."""
+        first = 0 if start is None else self.seek(start, side="left")
+        last = len(self) if end is None else self.seek(end)
+        for seg, segment in enumerate(self.segments):
+            lo = max(first - self.starts[seg], 0)
+            hi = min(last - self.starts[seg], segment.count)
+            if lo < hi:
+                yield segment.records[lo:hi]
+
+    def state_at(self, timestamp=None, n_drones=None):
+        """
+        Fleet positions (n_drones, 3) as they were at timestamp (default:
+        now), rebuilt from the last record of each drone. Drones with no
+        record yet stay at the origin.
+        """
+        end = None if timestamp is None else timestamp
+        if n_drones is None:
+            n_drones = max((int(s.valid()["drone"].max()) + 1 for s in self.segments if s.count), default=0)
+        positions = np.zeros((n_drones, 3))
+        for batch in self.replay(end=end):
+            # Last record per drone in this slice wins
+            drones = batch["drone"][::-1]
+            ids, last = np.unique(drones, return_index=True)
+            positions[ids] = batch["position"][::-1][last]
+        return positions
+
+    def commands(self, start=None, end=None):
+        """Yields (time, drone, command JSON, position) for each record."""
+        for batch in self.replay(start, end):
+            for record in batch:
+                yield float(record["time"]), int(record["drone"]), decode(record, self.directions), record["position"].tolist()
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or benchmark a telemetry log")
+    parser.add_argument("directory")
+    parser.add_argument("--at", type=float, default=None, help="Print fleet positions at this timestamp")
+    parser.add_argument("--tail", type=int, default=5, help="Print the last N commands")
+    parser.add_argument("--bench", type=int, default=0, help="Write N random records first and time the replay")
+    parser.add_argument("--drones", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.bench:
+        rng = np.random.default_rng(0)
+        move = {"command": "MOVE", "direction": "north", "distance_meters": 10.0}
+        start = time.perf_counter()
+        with TelemetryLog(args.directory) as log:
+            for i in range(0, args.bench, 10000):
+                n = min(10000, args.bench - i)
+                log.append_batch(rng.integers(0, args.drones, n), [move] * n, rng.uniform(-300, 300, (n, 3)))
+        print(f"Wrote {args.bench} records in {time.perf_counter() - start:.2f}s")
+
+    with TelemetryReader(args.directory) as log:
+        print(f"{args.directory}: {len(log)} records in {len(log.segments)} segments")
+        if not len(log):
+            exit()
+        start = time.perf_counter()
+        positions = log.state_at(args.at)
+        print(f"Rebuilt {len(positions)} drone positions in {1000 * (time.perf_counter() - start):.1f} ms")
+        if args.at is not None:
+            for drone, position in enumerate(positions):
+                print(f"  drone {drone}: {position.round(2).tolist()}")
+        for i in range(max(len(log) - args.tail, 0), len(log)):
+            record = log[i]
+            print(f"  {float(record['time']):.3f} drone {int(record['drone'])}: {decode(record, log.directions)} "
+                  f"-> {record['position'].round(2).tolist()}")
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from telemetry_log import MAX_COUNT, TelemetryLog, TelemetryReader
+
+MOVE = {"command": "MOVE", "direction": "north", "distance_meters": 10.0}
+T0 = 1760000000.0   # epoch scale, where start - 1e-9 == start
+
+
+def write(directory, timestamps, segment_records=4):
+    n = len(timestamps)
+    with TelemetryLog(str(directory), segment_records=segment_records) as log:
+        log.append_batch(list(range(n)), [MOVE] * n, np.zeros((n, 3)), timestamps)
+
+
+def replayed_times(log, start=None, end=None):
+    return [float(t) for batch in log.replay(start, end) for t in batch["time"]]
+
+
+def test_replay_includes_record_exactly_at_start(tmp_path):
+    times = [T0, T0 + 1, T0 + 2, T0 + 3, T0 + 4, T0 + 5]
+    write(tmp_path, times)
+    with TelemetryReader(str(tmp_path)) as log:
+        assert replayed_times(log, start=T0 + 2) == times[2:]
+        # T0 + 4 is the first record of the second segment
+        assert replayed_times(log, start=T0 + 4, end=T0 + 4) == [T0 + 4]
+        assert replayed_times(log, start=T0) == times
+
+
+def test_seek_sides(tmp_path):
+    # Equal timestamps spanning the segment boundary
+    times = [T0, T0 + 1, T0 + 1, T0 + 1, T0 + 1, T0 + 2]
+    write(tmp_path, times)
+    with TelemetryReader(str(tmp_path)) as log:
+        assert log.seek(T0 + 1, side="left") == 1
+        assert log.seek(T0 + 1) == 5
+        assert log.seek(T0 + 3, side="left") == len(log)
+        assert log.seek(T0 - 1, side="left") == 0
+
+
+def test_commands_round_trip(tmp_path):
+    commands = [
+        {"command": "MOVE", "direction": direction, "distance_meters": 5.0}
+        for direction in ["north east", "up", "forward", "backward", "left", "right", "home", "starboard"]
+    ]
+    commands += [
+        {"command": "CAPTURE_IMAGE", "count": 70000},
+        {"command": "HOVER", "duration_seconds": 12.5},
+        {"command": "LAND"},
+    ]
+    n = len(commands)
+    with TelemetryLog(str(tmp_path)) as log:
+        log.append_batch(list(range(n)), commands, np.zeros((n, 3)))
+    with TelemetryLog(str(tmp_path)) as log:
+        # A direction first seen before the reopen keeps its code
+        log.append(n, commands[7], [0.0, 0.0, 0.0])
+    with TelemetryReader(str(tmp_path)) as log:
+        assert [command for _, _, command, _ in log.commands()] == commands + [commands[7]]
+
+
+def test_count_out_of_range_is_rejected(tmp_path):
+    with TelemetryLog(str(tmp_path)) as log:
+        with pytest.raises(ValueError):
+            log.append(0, {"command": "CAPTURE_IMAGE", "count": MAX_COUNT + 1}, [0.0, 0.0, 0.0])
+        with pytest.raises(ValueError):
+            log.append(0, {"command": "CAPTURE_IMAGE", "count": -1}, [0.0, 0.0, 0.0])
+        assert log.segment.count == 0
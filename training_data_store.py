@@ -0,0 +1,176 @@
+import argparse
+import json
+import mmap
+import struct
+
+import numpy as np
+
+from spacy_training_data_1000 import ALL_INTENTS, PATTERNS
+
+# Entity labels the annotator produces (COUNT_SIMPLE is stored as COUNT)
+ENTITY_LABELS = [label for label in PATTERNS if label != "COUNT_SIMPLE"]
+
+# --- 1. File Layout ---
+# header  : magic, version, names-block length          (MAGIC_FMT)
+# names   : JSON {"labels": [...], "cats": [...]}
+# records : one per example, back to back
+#           u16 text length, u8 span count, cats bit vector,
+#           spans as (u16 start, u16 end, u8 label id), UTF-8 text
+# index   : u64 offset of every record, plus one for the end
+# footer  : u64 example count, u64 index offset           (FOOTER_FMT)
+MAGIC = b"DTTD"
+VERSION = 1
+MAGIC_FMT = "<4sHI"
+RECORD_FMT = "<HB"
+SPAN_FMT = "<HHB"
+FOOTER_FMT = "<QQ"
+SPAN_SIZE = struct.calcsize(SPAN_FMT)
+
+def _cats_size(n_cats):
+    return (n_cats + 7) // 8
+
+
+# --- 2. Writing ---
+def write_store(path, examples, labels=ENTITY_LABELS, cats=ALL_INTENTS):
+    """
+    Writes (text, {"entities": ..., "cats": ...}) examples to path.
+    Examples are streamed, so any iterable works. Returns the count.
+    """
+    label_ids = {label: i for i, label in enumerate(labels)}
+    names = json.dumps({"labels": list(labels), "cats": list(cats)}).encode("utf-8")
+    offsets = []
+
+    with open(path, "wb") as f:
+        f.write(struct.pack(MAGIC_FMT, MAGIC, VERSION, len(names)))
+        f.write(names)
+
+        for text, annots in examples:
+            raw = text.encode("utf-8")
+            entities = annots.get("entities", [])
+            if len(raw) > 0xFFFF or len(entities) > 0xFF:
+                raise ValueError(f"Example too large for the binary format: {text[:50]!r}...")
+
+            bits = 0
+            for i, cat in enumerate(cats):
+                if annots.get("cats", {}).get(cat):
+                    bits |= 1 << i
+
+            offsets.append(f.tell())
+            f.write(struct.pack(RECORD_FMT, len(raw), len(entities)))
+            f.write(bits.to_bytes(_cats_size(len(cats)), "little"))
+            for start, end, label in entities:
+                f.write(struct.pack(SPAN_FMT, start, end, label_ids[label]))
+            f.write(raw)
+
+        offsets.append(f.tell())
+        index_offset = f.tell()
+        f.write(np.asarray(offsets, dtype="<u8").tobytes())
+        f.write(struct.pack(FOOTER_FMT, len(offsets) - 1, index_offset))
+    return len(offsets) - 1
+
+
+# --- 3. Reading ---
+class TrainingDataStore:
+    """
+    Memory-mapped, random-access view of a file made by write_store.
+    Nothing is parsed until an example is asked for, so opening is instant
+    and the file can be much larger than RAM.
+
+        store = TrainingDataStore("spacy_training_data_1000.dtb")
+        text, annots = store[42]
+        train_ids, dev_ids = store.split(dev_ratio=0.2, seed=0)
+        for text, annots in store.take(train_ids):
+            ...
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, names_len = struct.unpack_from(MAGIC_FMT, self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} training data file.")
+        names = json.loads(self.mm[struct.calcsize(MAGIC_FMT):struct.calcsize(MAGIC_FMT) + names_len])
+        self.labels = names["labels"]
+        self.cats = names["cats"]
+        self.cats_size = _cats_size(len(self.cats))
+
+        footer_at = len(self.mm) - struct.calcsize(FOOTER_FMT)
+        self.count, index_offset = struct.unpack_from(FOOTER_FMT, self.mm, footer_at)
+        self.offsets = np.frombuffer(self.mm, dtype="<u8", count=self.count + 1, offset=index_offset)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        pos = int(self.offsets[i])
+        text_len, n_spans = struct.unpack_from(RECORD_FMT, self.mm, pos)
+        pos += struct.calcsize(RECORD_FMT)
+
+        bits = int.from_bytes(self.mm[pos:pos + self.cats_size], "little")
+        pos += self.cats_size
+
+        entities = []
+        for _ in range(n_spans):
+            start, end, label_id = struct.unpack_from(SPAN_FMT, self.mm, pos)
+            entities.append((start, end, self.labels[label_id]))
+            pos += SPAN_SIZE
+
+        text = self.mm[pos:pos + text_len].decode("utf-8")
+        cats = {cat: bool(bits >> i & 1) for i, cat in enumerate(self.cats)}
+        return text, {"entities": entities, "cats": cats}
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def take(self, indices):
+        """Lazily yields the examples at the given indices."""
+        for i in indices:
+            yield self[int(i)]
+
+    def split(self, dev_ratio=0.2, seed=0):
+        """
+        Shuffled train/dev split, returned as two arrays of example indices
+        (8 bytes per example). Pass them to take() to read the examples.
+        """
+        order = np.random.default_rng(seed).permutation(self.count)
+        split_point = int(self.count * (1 - dev_ratio))
+        return order[:split_point], order[split_point:]
+
+    def close(self):
+        # Drop our own view first, or mmap refuses to close
+        self.offsets = None
+        self.mm.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert training data to/from the binary format")
+    parser.add_argument("input", help=".json/.jsonl from spacy_training_data_1000.py, or a .dtb file")
+    parser.add_argument("output", nargs="?", help="Where to write the .dtb (omit to print info)")
+    args = parser.parse_args()
+
+    if args.output:
+        from convert_data_1000 import read_examples
+        n = write_store(args.output, read_examples(args.input))
+        print(f"Wrote {n} examples to {args.output}")
+    else:
+        with TrainingDataStore(args.input) as store:
+            print(f"{args.input}: {len(store)} examples")
+            print(f"Entity labels: {store.labels}")
+            print(f"Intents: {store.cats}")
+            if len(store):
+                print(f"First example: {store[0]}")
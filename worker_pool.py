@@ -0,0 +1,268 @@
+import gc
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from drone_parser import DEFAULT_BATCH_SIZE, doc_to_json, pipe_conditional
+
+# The model is stored here before forking. Children inherit it through
+# fork, so the weights are shared copy-on-write instead of loaded N times.
+_NLP = None
+
+# How often the collector checks that every worker is still alive
+LIVENESS_INTERVAL = 0.1
+
+# Seconds to wait before trying again when restarting the workers failed
+RESTART_BACKOFF = 5.0
+
+
+class WorkerError(RuntimeError):
+    """A job was lost (its worker died) or didn't finish within result_timeout."""
+
+
+# --- 1. Worker Process ---
+def _worker_loop(tasks, results, batch_size, conditional_ner):
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        job_id, commands = task
+        try:
+            if conditional_ner:
+                docs = pipe_conditional(_NLP, commands, batch_size)
+            else:
+                docs = _NLP.pipe(commands, batch_size=batch_size)
+            parsed = [doc_to_json(doc) for doc in docs]
+            results.put((job_id, parsed, None))
+        except Exception as e:
+            results.put((job_id, None, f"{type(e).__name__}: {e}"))
+
+def _restarted_worker_loop(tasks, results, batch_size, conditional_ner, config, model_bytes):
+    # Replacement workers are not forked from the parent, so they rebuild
+    # the model from its config and weights first
+    global _NLP
+    import spacy
+    from thinc.api import Config
+    config = Config().from_str(config)
+    _NLP = spacy.util.get_lang_class(config["nlp"]["lang"]).from_config(config)
+    _NLP.from_bytes(model_bytes)
+    _worker_loop(tasks, results, batch_size, conditional_ner)
+
+
+# --- 2. The Pool ---
+class ParserPool:
+    """
+    Runs the spaCy model in N forked worker processes.
+
+    The model must already be loaded (drone_parser.load_model) in this
+    process. Jobs go through a bounded queue: when max_pending jobs are
+    waiting, submit() blocks (or raises queue.Full after submit_timeout
+    seconds), which pushes back on whoever is sending commands.
+
+    Only the model runs in the workers. The cache, the rule fast path and
+    generate_command stay in the parent (see drone_parser.parse_commands).
+
+    If a worker dies (OOM killer, segfault) every job not yet answered
+    fails with WorkerError and all workers are restarted on fresh queues:
+    a killed process can leave a queue's lock held, so the old queues
+    can't be trusted. map_json also raises WorkerError when a job takes
+    longer than result_timeout seconds.
+    """
+
+    # Replacement workers start from here instead of being forked (see _restart)
+    RESTART_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+    def __init__(self, nlp, n_workers=None, batch_size=DEFAULT_BATCH_SIZE, max_pending=None, submit_timeout=None,
+                 conditional_ner=False, result_timeout=60.0):
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise RuntimeError("ParserPool needs the 'fork' start method (Linux/macOS).")
+        self.nlp = nlp
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.max_pending = max_pending or self.n_workers * 4
+        self.submit_timeout = submit_timeout
+        self.conditional_ner = conditional_ner
+        self.result_timeout = result_timeout
+        self.ctx = multiprocessing.get_context("fork")
+        self.futures = {}
+        self.futures_lock = threading.Lock()
+        self.job_ids = itertools.count()
+        self.workers = []
+        self.model_data = None
+        self.restarts = 0
+        self.restart_error = None
+        self.closing = False
+        self.collector = None
+
+    def start(self):
+        """Fork the workers. Call this before starting any other threads."""
+        global _NLP
+        _NLP = self.nlp
+        self._spawn_workers(self.ctx, _worker_loop)
+        self.collector = threading.Thread(target=self._collect, daemon=True)
+        self.collector.start()
+        return self
+
+    def _spawn_workers(self, ctx, target, *extra_args):
+        # Queues (and their locks) must come from the same context as the workers
+        self.tasks = ctx.Queue(maxsize=self.max_pending)
+        self.results = ctx.Queue()
+        args = (self.tasks, self.results, self.batch_size, self.conditional_ner) + extra_args
+        # Move everything allocated so far out of the GC's reach, so the
+        # collector in the children doesn't write to (and copy) those pages
+        gc.freeze()
+        try:
+            self.workers = []
+            for _ in range(self.n_workers):
+                worker = ctx.Process(target=target, args=args, daemon=True)
+                worker.start()
+                self.workers.append(worker)
+        finally:
+            gc.unfreeze()
+
+    def _resolve(self, job_id, parsed=None, error=None):
+        with self.futures_lock:
+            future = self.futures.pop(job_id, None)
+        # None when map_json already gave up on it
+        if future is None:
+            return
+        if error is None:
+            future.set_result(parsed)
+        else:
+            future.set_exception(WorkerError(error))
+
+    def _restart(self, dead):
+        """
+        Fails every unanswered job, then replaces all workers and both queues.
+
+        This runs on the collector thread while other threads (the HTTP
+        server's, the cache's) may hold locks, and a child forked now could
+        inherit one of them held forever. So replacements are started with
+        RESTART_METHOD instead of fork and load the model from its bytes:
+        slower to start, and the weights are no longer shared between them.
+        """
+        reason = f"Worker {dead.pid} died (exit code {dead.exitcode})." if dead else "Workers failed to start."
+        with self.futures_lock:
+            lost = list(self.futures)
+        for job_id in lost:
+            self._resolve(job_id, error=reason)
+        for worker in self.workers:
+            worker.terminate()
+            worker.join()
+        self.workers = []
+        for q in (self.tasks, self.results):
+            q.cancel_join_thread()
+            q.close()
+        if self.model_data is None:
+            self.model_data = (self.nlp.config.to_str(), self.nlp.to_bytes())
+        self._spawn_workers(multiprocessing.get_context(self.RESTART_METHOD), _restarted_worker_loop, *self.model_data)
+        self.restarts += 1
+        self.restart_error = None
+
+    def _collect(self):
+        retry_at = 0.0
+        while True:
+            dead = next((worker for worker in self.workers if worker.exitcode is not None), None)
+            # A failed restart can leave fewer workers than asked for
+            broken = dead is not None or len(self.workers) < self.n_workers
+            if broken and not self.closing and time.monotonic() >= retry_at:
+                try:
+                    self._restart(dead)
+                except Exception as e:
+                    # Keep collecting; jobs fail by timeout until a retry works
+                    self.restart_error = f"{type(e).__name__}: {e}"
+                    retry_at = time.monotonic() + RESTART_BACKOFF
+            try:
+                job_id, parsed, error = self.results.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                continue
+            if job_id is None:
+                break
+            self._resolve(job_id, parsed, error)
+
+    def submit(self, commands, timeout=None):
+        """Queue one batch of commands. Returns a Future of their parsed JSON."""
+        job_id = next(self.job_ids)
+        future = Future()
+        future.job_id = job_id
+        with self.futures_lock:
+            self.futures[job_id] = future
+        task = (job_id, list(commands))
+        timeout = timeout if timeout is not None else self.submit_timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # Wait in short steps: if the workers are restarted meanwhile, this
+        # queue is abandoned and the future has already failed
+        while not future.done():
+            step = LIVENESS_INTERVAL if deadline is None else min(LIVENESS_INTERVAL, max(0.0, deadline - time.monotonic()))
+            try:
+                self.tasks.put(task, timeout=step)
+                break
+            except queue.Full:
+                pass
+            except ValueError:
+                # Closed by a restart that is still starting the new queue
+                time.sleep(step)
+            if deadline is not None and time.monotonic() >= deadline:
+                with self.futures_lock:
+                    self.futures.pop(job_id, None)
+                raise queue.Full
+        return future
+
+    def map_json(self, commands, timeout=None):
+        """
+        Parses commands across the workers (batch_size per job) and returns
+        the {command, intents, slots} JSON for each, in input order.
+        Raises WorkerError if a job is lost or not done within result_timeout.
+        """
+        futures = [
+            self.submit(commands[i:i + self.batch_size], timeout=timeout)
+            for i in range(0, len(commands), self.batch_size)
+        ]
+        deadline = None if self.result_timeout is None else time.monotonic() + self.result_timeout
+        parsed = []
+        try:
+            for future in futures:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    parsed.extend(future.result(timeout=remaining))
+                except TimeoutError:
+                    raise WorkerError(f"No result within {self.result_timeout}s.")
+        except WorkerError:
+            # Drop the jobs we gave up on; their late results are ignored
+            with self.futures_lock:
+                for future in futures:
+                    self.futures.pop(future.job_id, None)
+            raise
+        return parsed
+
+    def stats(self):
+        with self.futures_lock:
+            in_flight = len(self.futures)
+        return {
+            "workers": self.n_workers,
+            "alive": sum(worker.is_alive() for worker in self.workers),
+            "restarts": self.restarts,
+            "restart_error": self.restart_error,
+            "in_flight_jobs": in_flight,
+            "max_pending": self.max_pending,
+        }
+
+    def close(self):
+        self.closing = True
+        for _ in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.results.put((None, None, None))
+        self.collector.join()
+        self.workers = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()